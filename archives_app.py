@@ -1,20 +1,51 @@
 import streamlit as st
 import sqlite3
 import pandas as pd
+import numpy as np
 import hashlib
 import datetime
 import plotly.express as px
 import plotly.graph_objects as go
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from datetime import datetime, timedelta
 import io
+import os
+import re
+import html
+import unicodedata
 import base64
+import queue
+import threading
+import time
+import csv
+import gzip
+import tempfile
+import itertools
+import bisect
+import heapq
+import zlib
+import zipfile
+import cProfile
+import pstats
+import marshal
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor, wait, TimeoutError as FutureTimeoutError
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.pdfgen import canvas
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
+
+# Moteur analytique optionnel pour les statistiques (pip install duckdb)
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
 
 # Configuration de la page
 st.set_page_config(
@@ -117,6 +148,40 @@ def load_css():
             border: 1px solid #ffeaa7;
         }
 
+        .resultats-recherche {
+            max-height: 75vh;
+            overflow-y: auto;
+            padding-right: 0.5rem;
+        }
+
+        .carte-resultat {
+            border: 1px solid #ddd;
+            border-radius: 8px;
+            padding: 1rem;
+            margin: 1rem 0;
+            background: white;
+            /* Les cartes hors de la zone visible ne sont pas mises en page par le navigateur */
+            content-visibility: auto;
+            contain-intrinsic-size: auto 180px;
+        }
+
+        .carte-resultat h4 {
+            margin-top: 0;
+        }
+
+        .carte-resultat mark {
+            background: #fde68a;
+            padding: 0 2px;
+        }
+
+        .carte-meta {
+            display: flex;
+            flex-wrap: wrap;
+            gap: 0.5rem 2rem;
+            font-size: 0.9em;
+            color: #666;
+        }
+
         @media (max-width: 768px) {
             .header-content {
                 flex-direction: column;
@@ -141,115 +206,866 @@ def load_css():
     """, unsafe_allow_html=True)
 
 
+# Configuration de la base de données
+DB_PATH = os.environ.get("CNA_DB_PATH", "archives.db")
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("CNA_DB_BUSY_TIMEOUT_MS", "5000"))
+DB_POOL_SIZE = int(os.environ.get("CNA_DB_POOL_SIZE", "8"))
+
+# Pragmas appliqués une seule fois à chaque nouvelle connexion
+DB_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -20000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+# Journal des requêtes : durée, lignes et page appelante de chaque requête SQL
+SEUIL_REQUETE_LENTE_MS = float(os.environ.get("CNA_SEUIL_REQUETE_LENTE_MS", "100"))
+JOURNAL_REQUETES_LENTES = int(os.environ.get("CNA_JOURNAL_REQUETES_LENTES", "50"))
+JOURNAL_REQUETES_DISTINCTES = 500
+# Écritures qui lient une empreinte de mot de passe : leurs valeurs ne doivent pas apparaître dans le journal
+JOURNAL_REQUETES_SENSIBLES = re.compile(r"(?is)^\s*(INSERT|UPDATE)\b.*\bpassword_hash\b")
+
+
+def masquer_parametres(params):
+    """Ne conserve que le type de chaque paramètre"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {nom: f"<{type(valeur).__name__}>" for nom, valeur in params.items()}
+    return [f"<{type(valeur).__name__}>" for valeur in params]
+
+
+class JournalRequetes:
+    """Agrégats par requête et tampon circulaire des requêtes lentes, partagés par toutes les connexions"""
+
+    def __init__(self, seuil_ms=SEUIL_REQUETE_LENTE_MS, max_lentes=JOURNAL_REQUETES_LENTES):
+        self.seuil_ms = seuil_ms
+        self._lentes = deque(maxlen=max_lentes)
+        self._agregats = OrderedDict()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def page(self, nom):
+        """Attribue à la page `nom` les requêtes exécutées par le thread courant"""
+        precedente = getattr(self._local, "page", None)
+        self._local.page = nom
+        try:
+            yield
+        finally:
+            self._local.page = precedente
+
+    def profil_courant(self):
+        """Profil du rendu en cours dans le thread courant (None hors profilage)"""
+        return getattr(self._local, "profil", None)
+
+    def definir_profil(self, profil):
+        self._local.profil = profil
+
+    def compter_temps_sql(self, duree_ms):
+        profil = getattr(self._local, "profil", None)
+        if profil is not None:
+            profil.ajouter("sql", duree_ms)
+
+    def enregistrer(self, sql, params, duree_ms, lignes):
+        page = getattr(self._local, "page", None) or f"({threading.current_thread().name})"
+        texte = " ".join(sql.split())
+
+        with self._lock:
+            cle = (page, texte)
+            agregat = self._agregats.pop(cle, None) or {"appels": 0, "total_ms": 0.0, "max_ms": 0.0, "lignes": 0}
+            agregat["appels"] += 1
+            agregat["total_ms"] += duree_ms
+            agregat["max_ms"] = max(agregat["max_ms"], duree_ms)
+            agregat["lignes"] += lignes
+            self._agregats[cle] = agregat
+            if len(self._agregats) > JOURNAL_REQUETES_DISTINCTES:
+                self._agregats.popitem(last=False)
+
+            if duree_ms >= self.seuil_ms:
+                # Le plan d'une requête sensible est calculé avec ces substituts : il ne dépend pas des valeurs
+                if JOURNAL_REQUETES_SENSIBLES.search(texte):
+                    params = masquer_parametres(params)
+                self._lentes.append({
+                    "horodatage": datetime.now(),
+                    "page": page,
+                    "sql": texte,
+                    "params": params,
+                    "duree_ms": duree_ms,
+                    "lignes": lignes,
+                    "plan": None,
+                })
+
+    def agregats(self):
+        with self._lock:
+            return pd.DataFrame([
+                {"page": page, "requete": texte, **agregat,
+                 "moyenne_ms": agregat["total_ms"] / agregat["appels"]}
+                for (page, texte), agregat in self._agregats.items()
+            ], columns=["page", "requete", "appels", "total_ms", "max_ms", "lignes", "moyenne_ms"])
+
+    def requetes_lentes(self):
+        """Requêtes lentes de la plus récente à la plus ancienne"""
+        with self._lock:
+            return list(reversed(self._lentes))
+
+    def vider(self):
+        with self._lock:
+            self._lentes.clear()
+            self._agregats.clear()
+
+
+def plan_requete(conn, entree):
+    """EXPLAIN QUERY PLAN d'une requête lente, calculé à la première consultation puis conservé"""
+    if entree["plan"] is None:
+        if entree["params"] is None or not re.match(r"(?i)\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b", entree["sql"]):
+            entree["plan"] = "(plan non disponible pour cette instruction)"
+        else:
+            try:
+                lignes = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + entree["sql"], entree["params"]).fetchall()
+            except sqlite3.Error as e:
+                entree["plan"] = f"(plan indisponible : {e})"
+            else:
+                profondeurs = {0: -1}
+                texte = []
+                for id_noeud, parent, _, detail in lignes:
+                    profondeurs[id_noeud] = profondeurs.get(parent, -1) + 1
+                    texte.append("  " * profondeurs[id_noeud] + detail)
+                entree["plan"] = "\n".join(texte)
+    return entree["plan"]
+
+
+class CurseurInstrumente(sqlite3.Cursor):
+    """Curseur qui mesure l'exécution et la lecture des lignes avant de les reporter au journal"""
+
+    _mesure = None
+
+    def _terminer(self):
+        mesure, self._mesure = self._mesure, None
+        if mesure is not None:
+            self.connection.journal.enregistrer(*mesure)
+
+    def _mesurer(self, appel, *args):
+        debut = time.perf_counter()
+        try:
+            return appel(*args)
+        finally:
+            if self._mesure is not None:
+                duree_ms = (time.perf_counter() - debut) * 1000
+                self.connection.journal.compter_temps_sql(duree_ms)
+                self._mesure[2] += duree_ms
+
+    def execute(self, sql, parameters=()):
+        if getattr(self.connection, "journal", None) is None:
+            return super().execute(sql, parameters)
+        self._terminer()
+        debut = time.perf_counter()
+        super().execute(sql, parameters)
+        duree_ms = (time.perf_counter() - debut) * 1000
+        self.connection.journal.compter_temps_sql(duree_ms)
+        self._mesure = [sql, parameters if isinstance(parameters, dict) else list(parameters), duree_ms, 0]
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        if getattr(self.connection, "journal", None) is None:
+            return super().executemany(sql, seq_of_parameters)
+        self._terminer()
+        debut = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        duree_ms = (time.perf_counter() - debut) * 1000
+        self.connection.journal.compter_temps_sql(duree_ms)
+        # Les paramètres d'un lot ne sont pas conservés (pas de plan pour les écritures en masse)
+        self._mesure = [sql, None, duree_ms, max(self.rowcount, 0)]
+        self._terminer()
+        return self
+
+    def fetchone(self):
+        ligne = self._mesurer(super().fetchone)
+        if ligne is None:
+            self._terminer()
+        elif self._mesure is not None:
+            self._mesure[3] += 1
+        return ligne
+
+    def fetchmany(self, size=None):
+        taille = self.arraysize if size is None else size
+        lignes = self._mesurer(super().fetchmany, taille)
+        if self._mesure is not None:
+            self._mesure[3] += len(lignes)
+        if len(lignes) < taille:
+            self._terminer()
+        return lignes
+
+    def fetchall(self):
+        lignes = self._mesurer(super().fetchall)
+        if self._mesure is not None:
+            self._mesure[3] += len(lignes)
+        self._terminer()
+        return lignes
+
+    def __next__(self):
+        try:
+            ligne = self._mesurer(super().__next__)
+        except StopIteration:
+            self._terminer()
+            raise
+        if self._mesure is not None:
+            self._mesure[3] += 1
+        return ligne
+
+    def close(self):
+        self._terminer()
+        super().close()
+
+    def __del__(self):
+        # Requête dont les lignes n'ont pas toutes été lues (ex. fetchone sur un COUNT)
+        try:
+            self._terminer()
+        except Exception:
+            pass
+
+
+class ConnexionInstrumentee(sqlite3.Connection):
+    """Connexion dont tous les curseurs alimentent le journal des requêtes (si `journal` est défini)"""
+
+    journal = None
+    # Génération des partitions d'archives attachées à cette connexion (voir ConnectionPool)
+    generation = -1
+
+    def cursor(self, factory=CurseurInstrumente):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class ConnectionPool:
+    """Pool de connexions SQLite longue durée partagé par toutes les sessions"""
+
+    def __init__(self, db_path, max_idle=DB_POOL_SIZE, journal=None):
+        self.db_path = db_path
+        self.journal = journal
+        # Partitions d'archives par année : {année: chemin du fichier}, attachées à chaque connexion
+        self.partitions = {}
+        self._generation = 0
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+        self._local = threading.local()
+
+    def _create(self):
+        conn = sqlite3.connect(self.db_path, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                               factory=ConnexionInstrumentee)
+        for pragma in DB_PRAGMAS:
+            conn.execute(pragma)
+        conn.journal = self.journal
+        return conn
+
+    def _acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._create()
+        if conn.generation != self._generation:
+            self._attacher(conn)
+        return conn
+
+    def _attacher(self, conn):
+        """Attache à la connexion les partitions d'archives qu'elle ne voit pas encore"""
+        generation = self._generation
+        attachees = {ligne[1] for ligne in conn.execute("PRAGMA database_list")}
+        for annee, chemin in sorted(self.partitions.items()):
+            schema = schema_partition(annee)
+            if schema not in attachees:
+                conn.execute(f"ATTACH DATABASE ? AS {schema}", (chemin,))
+        conn.generation = generation
+
+    def recharger_partitions(self, conn):
+        """Relit le registre des partitions ; chaque connexion les attache à sa prochaine utilisation"""
+        try:
+            lignes = conn.execute("SELECT annee, fichier FROM partitions_dossiers").fetchall()
+        except sqlite3.OperationalError:
+            # Base pas encore migrée
+            return
+        dossier = os.path.dirname(os.path.abspath(self.db_path))
+        self.partitions = {annee: os.path.join(dossier, fichier) for annee, fichier in lignes}
+        self._generation += 1
+
+    def _release(self, conn):
+        # Ne jamais rendre au pool une connexion avec une transaction en cours
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        # Les appels imbriqués dans un même thread réutilisent la même connexion
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+@st.cache_resource
+def get_journal_requetes():
+    return JournalRequetes()
+
+
+# Le pool survit aux reruns Streamlit (une instance par processus et par chemin de base)
+@st.cache_resource
+def get_connection_pool(db_path=DB_PATH):
+    pool = ConnectionPool(db_path, journal=get_journal_requetes())
+    with pool.connection() as conn:
+        pool.recharger_partitions(conn)
+    return pool
+
+
 # Gestionnaire de contexte pour les connexions DB
 @contextmanager
 def get_db_connection():
-    conn = sqlite3.connect('archives.db')
-    try:
+    with get_connection_pool().connection() as conn:
         yield conn
-    finally:
-        conn.close()
 
 
-# Initialisation de la base de données
-def init_database():
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
+# Profilage du rendu des pages (désactivé par défaut)
+PROFILAGE_ACTIF = os.environ.get("CNA_PROFILAGE", "0") == "1"
+PROFILAGE_RENDUS_PAR_PAGE = 500
+PHASES_RENDU = ("sql", "graphiques", "affichage", "calculs")
 
-        # Table des utilisateurs
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                role TEXT NOT NULL DEFAULT 'archiviste',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+class ProfilRendu:
+    """Temps propres de chaque phase d'un rendu : une phase imbriquée est déduite de la phase qui l'englobe"""
 
-        # Table des fonds documentaires
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS fonds (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nom TEXT UNIQUE NOT NULL,
-                description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+    def __init__(self):
+        self.phases = {}
+        self._pile = []
 
-        # Table des objets
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS objets (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nom TEXT UNIQUE NOT NULL,
-                description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+    def ajouter(self, nom, duree_ms):
+        self.phases[nom] = self.phases.get(nom, 0.0) + duree_ms
+        if self._pile:
+            self._pile[-1][1] += duree_ms
 
-        # Table des dossiers
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS dossiers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                fonds_id INTEGER,
-                objet_id INTEGER,
-                analyse TEXT,
-                mots_cles TEXT,
-                date_debut DATE,
-                date_fin DATE,
-                archiviste_id INTEGER,
-                date_traitement TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                temps_saisie INTEGER,
-                FOREIGN KEY (fonds_id) REFERENCES fonds (id),
-                FOREIGN KEY (objet_id) REFERENCES objets (id),
-                FOREIGN KEY (archiviste_id) REFERENCES users (id)
-            )
-        ''')
+    @contextmanager
+    def phase(self, nom):
+        entree = [time.perf_counter(), 0.0]
+        self._pile.append(entree)
+        try:
+            yield
+        finally:
+            self._pile.pop()
+            duree_ms = (time.perf_counter() - entree[0]) * 1000
+            self.phases[nom] = self.phases.get(nom, 0.0) + duree_ms - entree[1]
+            if self._pile:
+                self._pile[-1][1] += duree_ms
 
-        # Table des objectifs
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS objectifs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                objectif_quotidien INTEGER DEFAULT 10,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+
+@contextmanager
+def mesure_phase(nom):
+    """Attribue le temps du bloc à une phase du rendu en cours (sans effet hors profilage)"""
+    profil = get_journal_requetes().profil_courant()
+    if profil is None:
+        yield
+        return
+    with profil.phase(nom):
+        yield
+
+
+class ProfileurPages:
+    """Historique des durées de rendu par page et par phase, partagé par toutes les sessions"""
+
+    def __init__(self, journal, actif=PROFILAGE_ACTIF, max_rendus=PROFILAGE_RENDUS_PAR_PAGE):
+        # Le profil en cours est porté par le journal, que les curseurs alimentent en temps SQL
+        self._journal = journal
+        self.actif = actif
+        self._max_rendus = max_rendus
+        self._rendus = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def rendu(self, page):
+        if not self.actif:
+            yield
+            return
+
+        profil = ProfilRendu()
+        self._journal.definir_profil(profil)
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._journal.definir_profil(None)
+            total_ms = (time.perf_counter() - debut) * 1000
+            mesure = {"horodatage": datetime.now(), "total_ms": total_ms}
+            for phase in PHASES_RENDU[:-1]:
+                mesure[phase] = profil.phases.get(phase, 0.0)
+            # Le reste du temps : pandas, logique de la page et appels Streamlit non attribués
+            mesure["calculs"] = max(total_ms - sum(profil.phases.values()), 0.0)
+            with self._lock:
+                self._rendus.setdefault(page, deque(maxlen=self._max_rendus)).append(mesure)
+
+    def rendus(self):
+        with self._lock:
+            return pd.DataFrame(
+                [{"page": page, **mesure} for page, mesures in self._rendus.items() for mesure in mesures],
+                columns=["page", "horodatage", "total_ms", *PHASES_RENDU]
             )
-        ''')
 
-        # Insérer l'administrateur par défaut
-        admin_password = hashlib.sha256("admin123".encode()).hexdigest()
-        cursor.execute('''
-            INSERT OR IGNORE INTO users (username, password_hash, role)
-            VALUES (?, ?, ?)
-        ''', ("admin", admin_password, "administrateur"))
+    def vider(self):
+        with self._lock:
+            self._rendus.clear()
+
 
-        # Insérer des fonds par défaut
-        fonds_defaut = [
-            ("RESSOURCES HUMAINES", "Gestion du personnel"),
-            ("COMPTABILITÉ", "Documents comptables et financiers"),
-            ("TECHNIQUE", "Documentation technique"),
-            ("COMMERCIAL", "Documents commerciaux"),
-            ("JURIDIQUE", "Documents juridiques et contrats")
-        ]
+@st.cache_resource
+def get_profileur_pages():
+    return ProfileurPages(get_journal_requetes())
 
-        for fonds, desc in fonds_defaut:
-            cursor.execute('INSERT OR IGNORE INTO fonds (nom, description) VALUES (?, ?)', (fonds, desc))
 
-        # Insérer des objets par défaut
-        objets_defaut = [
-            ("Dossier individuel", "Dossier personnel d'un agent"),
-            ("Contrat", "Documents contractuels"),
-            ("Facture", "Documents de facturation"),
-            ("Procès-verbal", "Comptes-rendus de réunions"),
-            ("Correspondance", "Échanges de courrier")
-        ]
+@contextmanager
+def capture_cprofile(page):
+    """Profile un rendu complet avec cProfile et conserve le rapport dans la session"""
+    profileur = cProfile.Profile()
+    profileur.enable()
+    try:
+        yield
+    finally:
+        profileur.disable()
+        profileur.create_stats()
+        texte = io.StringIO()
+        pstats.Stats(profileur, stream=texte).sort_stats("cumulative").print_stats(40)
+        st.session_state.rapport_cprofile = {
+            "page": page,
+            "horodatage": datetime.now(),
+            "texte": texte.getvalue(),
+            "stats": marshal.dumps(profileur.stats),
+        }
 
-        for objet, desc in objets_defaut:
-            cursor.execute('INSERT OR IGNORE INTO objets (nom, description) VALUES (?, ?)', (objet, desc))
 
-        # Insérer objectif par défaut
-        cursor.execute('INSERT OR IGNORE INTO objectifs (objectif_quotidien) VALUES (?)', (10,))
+# Migrations du schéma de la base de données
+def _migration_001_schema_initial(cursor):
+    # Table des utilisateurs
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT NOT NULL DEFAULT 'archiviste',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Table des fonds documentaires
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fonds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nom TEXT UNIQUE NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Table des objets
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS objets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nom TEXT UNIQUE NOT NULL,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Table des dossiers
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dossiers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fonds_id INTEGER,
+            objet_id INTEGER,
+            analyse TEXT,
+            mots_cles TEXT,
+            date_debut DATE,
+            date_fin DATE,
+            archiviste_id INTEGER,
+            date_traitement TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            temps_saisie INTEGER,
+            FOREIGN KEY (fonds_id) REFERENCES fonds (id),
+            FOREIGN KEY (objet_id) REFERENCES objets (id),
+            FOREIGN KEY (archiviste_id) REFERENCES users (id)
+        )
+    ''')
+
+    # Table des objectifs
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS objectifs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            objectif_quotidien INTEGER DEFAULT 10,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Insérer l'administrateur par défaut
+    admin_password = hashlib.sha256("admin123".encode()).hexdigest()
+    cursor.execute('''
+        INSERT OR IGNORE INTO users (username, password_hash, role)
+        VALUES (?, ?, ?)
+    ''', ("admin", admin_password, "administrateur"))
+
+    # Insérer des fonds par défaut
+    fonds_defaut = [
+        ("RESSOURCES HUMAINES", "Gestion du personnel"),
+        ("COMPTABILITÉ", "Documents comptables et financiers"),
+        ("TECHNIQUE", "Documentation technique"),
+        ("COMMERCIAL", "Documents commerciaux"),
+        ("JURIDIQUE", "Documents juridiques et contrats")
+    ]
+
+    for fonds, desc in fonds_defaut:
+        cursor.execute('INSERT OR IGNORE INTO fonds (nom, description) VALUES (?, ?)', (fonds, desc))
+
+    # Insérer des objets par défaut
+    objets_defaut = [
+        ("Dossier individuel", "Dossier personnel d'un agent"),
+        ("Contrat", "Documents contractuels"),
+        ("Facture", "Documents de facturation"),
+        ("Procès-verbal", "Comptes-rendus de réunions"),
+        ("Correspondance", "Échanges de courrier")
+    ]
+
+    for objet, desc in objets_defaut:
+        cursor.execute('INSERT OR IGNORE INTO objets (nom, description) VALUES (?, ?)', (objet, desc))
+
+    # Insérer objectif par défaut (uniquement si aucun objectif n'existe encore)
+    cursor.execute('SELECT COUNT(*) FROM objectifs')
+    if cursor.fetchone()[0] == 0:
+        cursor.execute('INSERT INTO objectifs (objectif_quotidien) VALUES (?)', (10,))
+
+
+def _migration_002_index_dossiers(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_dossiers_date_traitement ON dossiers (date_traitement)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_dossiers_archiviste_id ON dossiers (archiviste_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_dossiers_fonds_id ON dossiers (fonds_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_dossiers_objet_id ON dossiers (objet_id)')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_dossiers_archiviste_date
+        ON dossiers (archiviste_id, date_traitement)
+    ''')
+    cursor.execute('ANALYZE dossiers')
+
+
+def _migration_003_jour_traitement(cursor):
+    # Colonne générée : calculée à partir de date_traitement, matérialisée dans les index
+    cursor.execute('''
+        ALTER TABLE dossiers ADD COLUMN jour_traitement TEXT
+        GENERATED ALWAYS AS (DATE(date_traitement)) VIRTUAL
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_dossiers_jour ON dossiers (jour_traitement, temps_saisie)')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_dossiers_archiviste_jour
+        ON dossiers (archiviste_id, jour_traitement)
+    ''')
+    cursor.execute('ANALYZE dossiers')
+
+
+def _migration_004_recherche_plein_texte(cursor):
+    # Index FTS5 à contenu externe : le texte reste dans dossiers, seul l'index est stocké
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS dossiers_fts USING fts5(
+            analyse,
+            mots_cles,
+            content='dossiers',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+
+    # Synchronisation de l'index avec la table dossiers
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS dossiers_fts_ai AFTER INSERT ON dossiers BEGIN
+            INSERT INTO dossiers_fts (rowid, analyse, mots_cles)
+            VALUES (new.id, new.analyse, new.mots_cles);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS dossiers_fts_ad AFTER DELETE ON dossiers BEGIN
+            INSERT INTO dossiers_fts (dossiers_fts, rowid, analyse, mots_cles)
+            VALUES ('delete', old.id, old.analyse, old.mots_cles);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS dossiers_fts_au AFTER UPDATE OF analyse, mots_cles ON dossiers BEGIN
+            INSERT INTO dossiers_fts (dossiers_fts, rowid, analyse, mots_cles)
+            VALUES ('delete', old.id, old.analyse, old.mots_cles);
+            INSERT INTO dossiers_fts (rowid, analyse, mots_cles)
+            VALUES (new.id, new.analyse, new.mots_cles);
+        END
+    ''')
+
+    # Indexation des dossiers existants
+    cursor.execute("INSERT INTO dossiers_fts (dossiers_fts) VALUES ('rebuild')")
+
+
+def _migration_005_stats_journalieres(cursor):
+    # Agrégats par jour, archiviste, fonds et objet (0 remplace un identifiant absent)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_journalieres (
+            jour TEXT NOT NULL,
+            archiviste_id INTEGER NOT NULL,
+            fonds_id INTEGER NOT NULL,
+            objet_id INTEGER NOT NULL,
+            nb_dossiers INTEGER NOT NULL DEFAULT 0,
+            somme_temps INTEGER NOT NULL DEFAULT 0,
+            nb_temps INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (jour, archiviste_id, fonds_id, objet_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_stats_journalieres_archiviste
+        ON stats_journalieres (archiviste_id, jour)
+    ''')
+
+    ajout = '''
+        INSERT INTO stats_journalieres
+            (jour, archiviste_id, fonds_id, objet_id, nb_dossiers, somme_temps, nb_temps)
+        VALUES (
+            new.jour_traitement, IFNULL(new.archiviste_id, 0), IFNULL(new.fonds_id, 0), IFNULL(new.objet_id, 0),
+            1, IFNULL(new.temps_saisie, 0), new.temps_saisie IS NOT NULL
+        )
+        ON CONFLICT (jour, archiviste_id, fonds_id, objet_id) DO UPDATE SET
+            nb_dossiers = nb_dossiers + 1,
+            somme_temps = somme_temps + excluded.somme_temps,
+            nb_temps = nb_temps + excluded.nb_temps;
+    '''
+    retrait = '''
+        UPDATE stats_journalieres SET
+            nb_dossiers = nb_dossiers - 1,
+            somme_temps = somme_temps - IFNULL(old.temps_saisie, 0),
+            nb_temps = nb_temps - (old.temps_saisie IS NOT NULL)
+        WHERE jour = old.jour_traitement
+            AND archiviste_id = IFNULL(old.archiviste_id, 0)
+            AND fonds_id = IFNULL(old.fonds_id, 0)
+            AND objet_id = IFNULL(old.objet_id, 0);
+        DELETE FROM stats_journalieres
+        WHERE jour = old.jour_traitement
+            AND archiviste_id = IFNULL(old.archiviste_id, 0)
+            AND fonds_id = IFNULL(old.fonds_id, 0)
+            AND objet_id = IFNULL(old.objet_id, 0)
+            AND nb_dossiers <= 0;
+    '''
+
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS stats_journalieres_ai AFTER INSERT ON dossiers BEGIN {ajout} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS stats_journalieres_ad AFTER DELETE ON dossiers BEGIN {retrait} END')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS stats_journalieres_au
+        AFTER UPDATE OF date_traitement, archiviste_id, fonds_id, objet_id, temps_saisie ON dossiers
+        BEGIN {retrait} {ajout} END
+    ''')
+
+    reconstruire_stats_journalieres(cursor)
+
+
+def reconstruire_stats_journalieres(cursor, source="dossiers"):
+    """Recalcule entièrement la table d'agrégats à partir des dossiers (`source` : table ou union des partitions)"""
+    cursor.execute('DELETE FROM stats_journalieres')
+    cursor.execute(f'''
+        INSERT INTO stats_journalieres
+            (jour, archiviste_id, fonds_id, objet_id, nb_dossiers, somme_temps, nb_temps)
+        SELECT
+            jour_traitement,
+            IFNULL(archiviste_id, 0),
+            IFNULL(fonds_id, 0),
+            IFNULL(objet_id, 0),
+            COUNT(*),
+            IFNULL(SUM(temps_saisie), 0),
+            COUNT(temps_saisie)
+        FROM {source}
+        GROUP BY 1, 2, 3, 4
+    ''')
+
+
+def _migration_006_partitions_dossiers(cursor):
+    # Registre des fichiers d'archives annuels (chemins relatifs au dossier de la base principale)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS partitions_dossiers (
+            annee INTEGER PRIMARY KEY,
+            fichier TEXT NOT NULL,
+            nb_dossiers INTEGER NOT NULL DEFAULT 0,
+            archive_le TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+# Dossiers lus par lot quand une migration alimente une table dérivée à partir des dossiers existants
+MIGRATION_TAILLE_LOT = 5000
+
+
+def _parcourir_dossiers_existants(cursor, colonnes, filtre, traiter):
+    """Passe les dossiers existants à `traiter(conn, lignes)` par lots, partitions d'archives attachées comprises"""
+    schemas = ["main"] + [ligne[1] for ligne in cursor.execute("PRAGMA database_list").fetchall()
+                          if ligne[1].startswith("cna_")]
+    for schema in schemas:
+        lecture = cursor.connection.execute(f"SELECT {colonnes} FROM {schema}.dossiers WHERE {filtre}")
+        while True:
+            lignes = lecture.fetchmany(MIGRATION_TAILLE_LOT)
+            if not lignes:
+                break
+            traiter(cursor.connection, lignes)
+
+
+def _migration_007_mots_cles(cursor):
+    # Dictionnaire des mots-clés normalisés et index inversé mot-clé → dossiers
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS mots_cles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            terme TEXT UNIQUE NOT NULL,
+            libelle TEXT NOT NULL,
+            nb_dossiers INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dossier_mots_cles (
+            mot_cle_id INTEGER NOT NULL,
+            dossier_id INTEGER NOT NULL,
+            PRIMARY KEY (mot_cle_id, dossier_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_dossier_mots_cles_dossier ON dossier_mots_cles (dossier_id)')
+
+    # Indexation des dossiers existants
+    _parcourir_dossiers_existants(cursor, "id, mots_cles", "mots_cles IS NOT NULL AND mots_cles != ''",
+                                  indexer_mots_cles)
+
+
+def _migration_008_quasi_doublons(cursor):
+    # Signature MinHash de l'analyse de chaque dossier et seaux LSH par fonds et objet
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dossiers_minhash (
+            dossier_id INTEGER PRIMARY KEY,
+            fonds_id INTEGER NOT NULL,
+            objet_id INTEGER NOT NULL,
+            signature BLOB NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dossiers_lsh (
+            fonds_id INTEGER NOT NULL,
+            objet_id INTEGER NOT NULL,
+            cle INTEGER NOT NULL,
+            dossier_id INTEGER NOT NULL,
+            PRIMARY KEY (fonds_id, objet_id, cle, dossier_id)
+        ) WITHOUT ROWID
+    ''')
+
+    # Signatures des dossiers existants
+    _parcourir_dossiers_existants(cursor, "id, fonds_id, objet_id, analyse", "analyse IS NOT NULL", indexer_minhash)
+
+
+def _migration_009_jours_statistiques_modifies(cursor):
+    # Dernière modification de chaque jour des agrégats : la copie DuckDB ne relit que ces jours
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_journalieres_modifiees (
+            jour TEXT PRIMARY KEY,
+            sequence INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_stats_journalieres_modifiees_sequence
+        ON stats_journalieres_modifiees (sequence)
+    ''')
+
+    marquer = '''
+        INSERT INTO stats_journalieres_modifiees (jour, sequence)
+        VALUES ({jour}, (SELECT IFNULL(MAX(sequence), 0) + 1 FROM stats_journalieres_modifiees))
+        ON CONFLICT (jour) DO UPDATE SET sequence = excluded.sequence;
+    '''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS stats_journalieres_modifiees_ai AFTER INSERT ON stats_journalieres
+        BEGIN {marquer.format(jour="new.jour")} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS stats_journalieres_modifiees_au AFTER UPDATE ON stats_journalieres
+        BEGIN {marquer.format(jour="old.jour")} {marquer.format(jour="new.jour")} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS stats_journalieres_modifiees_ad AFTER DELETE ON stats_journalieres
+        BEGIN {marquer.format(jour="old.jour")} END
+    ''')
+
+
+# Étapes de migration ordonnées : (version, description, fonction)
+MIGRATIONS = [
+    (1, "Schéma initial et données par défaut", _migration_001_schema_initial),
+    (2, "Index sur la table dossiers", _migration_002_index_dossiers),
+    (3, "Jour de traitement indexé", _migration_003_jour_traitement),
+    (4, "Index plein texte des dossiers", _migration_004_recherche_plein_texte),
+    (5, "Agrégats journaliers des saisies", _migration_005_stats_journalieres),
+    (6, "Registre des partitions annuelles d'archives", _migration_006_partitions_dossiers),
+    (7, "Dictionnaire et index inversé des mots-clés", _migration_007_mots_cles),
+    (8, "Signatures MinHash et seaux LSH des analyses", _migration_008_quasi_doublons),
+    (9, "Journal des jours modifiés des agrégats journaliers", _migration_009_jours_statistiques_modifies),
+]
+
+
+def apply_migrations(conn):
+    """Applique les migrations manquantes et retourne la version du schéma"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+    for version, description, migration in MIGRATIONS:
+        # BEGIN IMMEDIATE sérialise les migrations entre processus concurrents
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            deja_appliquee = conn.execute(
+                'SELECT 1 FROM schema_version WHERE version = ?', (version,)
+            ).fetchone()
+            if not deja_appliquee:
+                migration(conn.cursor())
+                conn.execute(
+                    'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                    (version, description)
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return conn.execute('SELECT MAX(version) FROM schema_version').fetchone()[0]
 
-        conn.commit()
+
+# Initialisation de la base de données (une seule fois par processus)
+@st.cache_resource
+def init_database():
+    pool = get_connection_pool()
+    with pool.connection() as conn:
+        version = apply_migrations(conn)
+        pool.recharger_partitions(conn)
+        return version
 
 
 # Fonctions d'authentification
@@ -272,23 +1088,92 @@ def authenticate_user(username, password):
         return None
 
 
+# Cache des données de référence (fonds, objets, archivistes, objectif)
+CACHE_TTL_SECONDES = int(os.environ.get("CNA_CACHE_TTL", "300"))
+
+
+class CacheReference:
+    """Cache partagé entre sessions, avec durée de vie et invalidation explicite"""
+
+    def __init__(self, ttl=CACHE_TTL_SECONDES):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entrees = {}
+        self._lock = threading.Lock()
+
+    def get(self, cle, charger):
+        with self._lock:
+            entree = self._entrees.get(cle)
+            if entree is not None and time.monotonic() - entree[0] < self.ttl:
+                self.hits += 1
+                valeur = entree[1]
+            else:
+                self.misses += 1
+                valeur = None
+
+        if valeur is None:
+            valeur = charger()
+            with self._lock:
+                self._entrees[cle] = (time.monotonic(), valeur)
+
+        # Chaque appelant reçoit sa propre copie d'un DataFrame
+        return valeur.copy() if isinstance(valeur, pd.DataFrame) else valeur
+
+    def invalider(self, *cles):
+        with self._lock:
+            for cle in cles or list(self._entrees):
+                self._entrees.pop(cle, None)
+            self.invalidations += 1
+
+    def statistiques(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "taux": (self.hits / total * 100) if total else 0,
+                "invalidations": self.invalidations,
+                "entrees": len(self._entrees),
+            }
+
+
+@st.cache_resource
+def get_cache_reference():
+    return CacheReference()
+
+
+def invalider_cache_reference(*cles):
+    get_cache_reference().invalider(*cles)
+
+
 # Fonctions utilitaires
-def get_fonds():
+def _charger_fonds():
     with get_db_connection() as conn:
         return pd.read_sql_query('SELECT * FROM fonds ORDER BY nom', conn)
 
 
-def get_objets():
+def _charger_objets():
     with get_db_connection() as conn:
         return pd.read_sql_query('SELECT * FROM objets ORDER BY nom', conn)
 
 
-def get_archivistes():
+def _charger_archivistes():
     with get_db_connection() as conn:
         return pd.read_sql_query('SELECT id, username FROM users WHERE role = "archiviste" ORDER BY username', conn)
 
 
-def get_objectif_quotidien():
+def _charger_annees():
+    with get_db_connection() as conn:
+        return [ligne[0] for ligne in conn.execute(f'''
+            SELECT DISTINCT substr(date_debut, 1, 4) FROM {table_dossiers()} d
+            WHERE date_debut IS NOT NULL
+            ORDER BY 1 DESC
+        ''')]
+
+
+def _charger_objectif_quotidien():
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('SELECT objectif_quotidien FROM objectifs ORDER BY updated_at DESC LIMIT 1')
@@ -296,6 +1181,985 @@ def get_objectif_quotidien():
         return result[0] if result else 10
 
 
+def get_fonds():
+    return get_cache_reference().get("fonds", _charger_fonds)
+
+
+def get_objets():
+    return get_cache_reference().get("objets", _charger_objets)
+
+
+def get_archivistes():
+    return get_cache_reference().get("archivistes", _charger_archivistes)
+
+
+def get_annees():
+    return get_cache_reference().get("annees", _charger_annees)
+
+
+def get_objectif_quotidien():
+    return get_cache_reference().get("objectif", _charger_objectif_quotidien)
+
+
+# Périodes glissantes exprimées en nombre de jours
+PERIODES_GLISSANTES = {
+    "Cette semaine": 7,
+    "Ce mois": 30,
+    "7 derniers jours": 7,
+    "30 derniers jours": 30,
+}
+
+
+def bornes_periode(periode, date_debut=None, date_fin=None):
+    """Retourne l'intervalle semi-ouvert [début, fin) d'une période (None = non borné)"""
+    today = datetime.now().date()
+
+    if periode == "Aujourd'hui":
+        return today, today + timedelta(days=1)
+    if periode in PERIODES_GLISSANTES:
+        return today - timedelta(days=PERIODES_GLISSANTES[periode]), None
+    if periode == "Année en cours":
+        return datetime(today.year, 1, 1).date(), datetime(today.year + 1, 1, 1).date()
+    if periode == "Période personnalisée":
+        return date_debut, date_fin + timedelta(days=1) if date_fin else None
+    return None, None
+
+
+def filtre_periode(colonne, bornes):
+    """Construit un prédicat de plage indexable sur une colonne jour et ses paramètres"""
+    debut, fin = bornes
+    clauses = []
+    params = []
+
+    if debut is not None:
+        clauses.append(f"{colonne} >= ?")
+        params.append(debut.isoformat())
+    if fin is not None:
+        clauses.append(f"{colonne} < ?")
+        params.append(fin.isoformat())
+
+    return " AND ".join(clauses), params
+
+
+# Pagination côté serveur
+# Tris disponibles : (expression de tri, sens) ; d.id départage les égalités
+TRIS_SAISIES = {
+    "Date (récent)": ("d.date_traitement", "DESC"),
+    "Date (ancien)": ("d.date_traitement", "ASC"),
+    "Temps de saisie": ("COALESCE(d.temps_saisie, 0)", "DESC"),
+    "Alphabétique": ("COALESCE(d.analyse, '')", "ASC"),
+}
+
+
+def curseurs_pagination(nom, signature):
+    """Retourne les curseurs mémorisés d'une pagination, réinitialisés si la requête change"""
+    etat = st.session_state.get(nom)
+    if etat is None or etat['signature'] != signature:
+        etat = {'signature': signature, 'curseurs': {}}
+        st.session_state[nom] = etat
+    return etat['curseurs']
+
+
+def lire_page(conn, colonnes, source, filtres, params, tri, page, taille_page, curseurs=None):
+    """Lit uniquement les lignes d'une page, par curseur (keyset) si la fin de la page précédente est connue"""
+    expression, sens = tri
+    query = f"SELECT {colonnes}, {expression} AS _cle_tri FROM {source} WHERE {filtres}"
+    params = list(params)
+    offset = 0
+
+    cle_precedente = curseurs.get(page - 1) if curseurs is not None else None
+    if page > 1 and cle_precedente is not None:
+        comparateur = '<' if sens == 'DESC' else '>'
+        query += f" AND ({expression}, d.id) {comparateur} (?, ?)"
+        params.extend(cle_precedente)
+    elif page > 1:
+        # Accès direct à une page jamais visitée : repli sur OFFSET
+        offset = (page - 1) * taille_page
+
+    query += f" ORDER BY {expression} {sens}, d.id {sens} LIMIT ? OFFSET ?"
+    params.extend([taille_page, offset])
+
+    page_df = pd.read_sql_query(query, conn, params=params)
+
+    if curseurs is not None and not page_df.empty:
+        derniere_cle = page_df['_cle_tri'].iloc[-1]
+        curseurs[page] = (
+            derniere_cle.item() if hasattr(derniere_cle, 'item') else derniere_cle,
+            int(page_df['id'].iloc[-1])
+        )
+
+    return page_df.drop(columns='_cle_tri')
+
+
+# Recherche plein texte
+FTS_OPERATEURS = {"AND", "OR", "NOT"}
+FTS_DEBUT_SURLIGNAGE = "\ue000"
+FTS_FIN_SURLIGNAGE = "\ue001"
+MESSAGE_REQUETE_FTS_INVALIDE = ("Requête de recherche invalide. Utilisez des mots, des \"phrases exactes\", "
+                                "des préfixes (archiv*) et les opérateurs AND, OR, NOT (« facture NOT avoir »).")
+
+
+def construire_requete_fts(texte):
+    """Traduit la saisie utilisateur en requête FTS5 (phrases, préfixes et opérateurs booléens)"""
+    termes = []
+
+    for jeton in re.findall(r'"[^"]*"?|\S+', texte):
+        if jeton.startswith('"'):
+            phrase = jeton.strip('"').strip()
+            if phrase:
+                termes.append('"' + phrase + '"')
+        elif jeton in FTS_OPERATEURS:
+            # FTS5 n'accepte pas deux opérateurs consécutifs : « AND NOT » devient « NOT »
+            if termes and termes[-1] in FTS_OPERATEURS:
+                termes[-1] = jeton
+            else:
+                termes.append(jeton)
+        elif jeton.endswith('*') and jeton.rstrip('*'):
+            termes.append('"' + jeton.rstrip('*').replace('"', '') + '"*')
+        else:
+            mot = jeton.replace('"', '').rstrip('*')
+            if mot:
+                termes.append('"' + mot + '"')
+
+    # FTS5 n'a pas de NOT unaire : l'ignorer chercherait exactement les dossiers à exclure
+    if termes and termes[0] == "NOT":
+        raise ValueError("NOT doit suivre un terme à inclure")
+    # Un AND ou OR en début, un opérateur en fin de requête n'ont pas de sens : on les ignore
+    while termes and termes[0] in FTS_OPERATEURS:
+        termes.pop(0)
+    while termes and termes[-1] in FTS_OPERATEURS:
+        termes.pop()
+
+    return " ".join(termes)
+
+
+def surligner_extrait(extrait):
+    """Échappe un extrait FTS5 et convertit ses marqueurs en balises <mark>"""
+    if not extrait:
+        return ""
+    extrait = html.escape(extrait)
+    return extrait.replace(FTS_DEBUT_SURLIGNAGE, "<mark>").replace(FTS_FIN_SURLIGNAGE, "</mark>")
+
+
+# Mots-clés normalisés : dictionnaire `mots_cles` et index inversé `dossier_mots_cles`
+SEPARATEURS_MOTS_CLES = re.compile(r"[,;\n]")
+MOTS_CLES_PAR_REQUETE = 500
+
+
+def normaliser_mot_cle(texte):
+    """Forme de comparaison d'un mot-clé : sans accents, en minuscules, espaces réduits"""
+    decompose = unicodedata.normalize("NFKD", texte)
+    sans_accents = "".join(c for c in decompose if not unicodedata.combining(c))
+    return " ".join(sans_accents.casefold().split())
+
+
+def extraire_mots_cles(texte):
+    """Mots-clés distincts d'une saisie : {forme normalisée: libellé saisi}"""
+    mots = {}
+    for libelle in SEPARATEURS_MOTS_CLES.split(texte or ""):
+        libelle = " ".join(libelle.split())
+        terme = normaliser_mot_cle(libelle)
+        if terme and terme not in mots:
+            mots[terme] = libelle
+    return mots
+
+
+def indexer_mots_cles(conn, lignes):
+    """Alimente le dictionnaire et l'index inversé pour des dossiers nouvellement insérés [(id, mots_cles)]"""
+    liens = []
+    libelles = {}
+    for dossier_id, texte in lignes:
+        for terme, libelle in extraire_mots_cles(texte).items():
+            libelles.setdefault(terme, libelle)
+            liens.append((terme, dossier_id))
+    if not liens:
+        return
+
+    # Le premier libellé rencontré devient le libellé affiché du mot-clé
+    conn.executemany('INSERT OR IGNORE INTO mots_cles (terme, libelle) VALUES (?, ?)', libelles.items())
+    termes = list(libelles)
+    ids = {}
+    for debut in range(0, len(termes), MOTS_CLES_PAR_REQUETE):
+        lot = termes[debut:debut + MOTS_CLES_PAR_REQUETE]
+        ids.update(conn.execute(
+            f"SELECT terme, id FROM mots_cles WHERE terme IN ({','.join('?' * len(lot))})", lot
+        ).fetchall())
+
+    conn.executemany('INSERT OR IGNORE INTO dossier_mots_cles (mot_cle_id, dossier_id) VALUES (?, ?)',
+                     [(ids[terme], dossier_id) for terme, dossier_id in liens])
+    usages = {}
+    for terme, _ in liens:
+        usages[ids[terme]] = usages.get(ids[terme], 0) + 1
+    conn.executemany('UPDATE mots_cles SET nb_dossiers = nb_dossiers + ? WHERE id = ?',
+                     [(nb, mot_cle_id) for mot_cle_id, nb in usages.items()])
+
+
+def filtre_mots_cles(mots_cles_ids):
+    """Prédicat : dossiers portant tous les mots-clés donnés, résolu par l'index inversé"""
+    placeholders = ",".join("?" * len(mots_cles_ids))
+    return (f"d.id IN (SELECT dossier_id FROM dossier_mots_cles WHERE mot_cle_id IN ({placeholders}) "
+            f"GROUP BY dossier_id HAVING COUNT(*) = ?)", [*mots_cles_ids, len(mots_cles_ids)])
+
+
+def ids_mots_cles(conn, libelles):
+    """Identifiants des mots-clés du dictionnaire correspondant à des libellés, sous leur forme normalisée"""
+    termes = list(dict.fromkeys(normaliser_mot_cle(libelle) for libelle in libelles))
+    return [ligne[0] for ligne in conn.execute(
+        f"SELECT id FROM mots_cles WHERE terme IN ({','.join('?' * len(termes))})", termes
+    )]
+
+
+def top_mots_cles(conn, bornes=(None, None), limite=20):
+    """Mots-clés les plus utilisés sur une période (compteurs du dictionnaire si la période est complète)"""
+    filtre, params = filtre_periode('d.jour_traitement', bornes)
+    if not filtre:
+        return pd.read_sql_query('''
+            SELECT libelle, nb_dossiers FROM mots_cles
+            WHERE nb_dossiers > 0
+            ORDER BY nb_dossiers DESC, libelle
+            LIMIT ?
+        ''', conn, params=[limite])
+    return pd.read_sql_query(f'''
+        SELECT m.libelle, COUNT(*) as nb_dossiers
+        FROM {table_dossiers(bornes)} d
+        JOIN dossier_mots_cles dm ON dm.dossier_id = d.id
+        JOIN mots_cles m ON m.id = dm.mot_cle_id
+        WHERE {filtre}
+        GROUP BY m.id, m.libelle
+        ORDER BY nb_dossiers DESC, m.libelle
+        LIMIT ?
+    ''', conn, params=params + [limite])
+
+
+AUTOCOMPLETION_TERMES_MAX = int(os.environ.get("CNA_AUTOCOMPLETION_MAX", "50000"))
+AUTOCOMPLETION_SUGGESTIONS = 8
+AUTOCOMPLETION_PREFIXE_MIN = 2
+RECHERCHE_MOTS_CLES_SUGGESTIONS = 20
+
+
+class IndexPrefixesMotsCles:
+    """Index en mémoire des mots-clés (tableau trié + bisect) pour l'autocomplétion, borné en taille"""
+
+    def __init__(self, taille_max=AUTOCOMPLETION_TERMES_MAX):
+        self.taille_max = taille_max
+        # Les derniers mots-clés ajoutés sont protégés de l'éviction le temps d'être réutilisés
+        self.periode_grace = max(1, taille_max // 10)
+        self._termes = []
+        self._entrees = {}
+        self._recents = OrderedDict()
+        # Tas des candidats à l'éviction (nb_dossiers, ordre d'ajout, terme) ; les entrées périmées sont ignorées
+        self._tas = []
+        self._ordre = itertools.count()
+        self._lock = threading.Lock()
+
+    def charger(self, conn):
+        """Reconstruit l'index à partir des mots-clés les plus utilisés du dictionnaire"""
+        lignes = conn.execute('''
+            SELECT terme, libelle, nb_dossiers FROM mots_cles
+            WHERE nb_dossiers > 0
+            ORDER BY nb_dossiers DESC
+            LIMIT ?
+        ''', (self.taille_max,)).fetchall()
+        entrees = {terme: [libelle, nb] for terme, libelle, nb in lignes}
+        with self._lock:
+            self._entrees = entrees
+            self._termes = sorted(entrees)
+            self._recents.clear()
+            self._reconstruire_tas()
+
+    def _reconstruire_tas(self):
+        self._tas = [(nb, next(self._ordre), terme) for terme, (_, nb) in self._entrees.items()
+                     if terme not in self._recents]
+        heapq.heapify(self._tas)
+
+    def _evincer(self):
+        """Retire le mot-clé le moins utilisé (le plus ancien à égalité) hors période de grâce"""
+        while self._tas:
+            nb, _, terme = heapq.heappop(self._tas)
+            entree = self._entrees.get(terme)
+            if entree is not None and entree[1] == nb and terme not in self._recents:
+                break
+        else:
+            terme, _ = self._recents.popitem(last=False)
+        del self._entrees[terme]
+        del self._termes[bisect.bisect_left(self._termes, terme)]
+
+    def ajouter(self, texte):
+        """Met à jour l'index avec les mots-clés d'un dossier qui vient d'être enregistré"""
+        with self._lock:
+            for terme, libelle in extraire_mots_cles(texte).items():
+                entree = self._entrees.get(terme)
+                if entree is not None:
+                    entree[1] += 1
+                    if terme not in self._recents:
+                        heapq.heappush(self._tas, (entree[1], next(self._ordre), terme))
+                    continue
+
+                if self._entrees and len(self._entrees) >= self.taille_max:
+                    self._evincer()
+                self._entrees[terme] = [libelle, 1]
+                bisect.insort(self._termes, terme)
+
+                # Fin de la période de grâce du plus ancien mot-clé récent : il redevient évinçable
+                self._recents[terme] = None
+                if len(self._recents) > self.periode_grace:
+                    ancien, _ = self._recents.popitem(last=False)
+                    if ancien in self._entrees:
+                        heapq.heappush(self._tas, (self._entrees[ancien][1], next(self._ordre), ancien))
+
+            # Les entrées périmées du tas sont purgées quand elles dominent
+            if len(self._tas) > 2 * len(self._entrees) + 64:
+                self._reconstruire_tas()
+
+    def suggerer(self, prefixe, limite=AUTOCOMPLETION_SUGGESTIONS):
+        """[(libellé, nb_dossiers)] des mots-clés commençant par le préfixe, les plus utilisés d'abord"""
+        prefixe = normaliser_mot_cle(prefixe)
+        if len(prefixe) < AUTOCOMPLETION_PREFIXE_MIN:
+            return []
+        with self._lock:
+            # Tous les termes du préfixe forment une plage contiguë du tableau trié
+            debut = bisect.bisect_left(self._termes, prefixe)
+            fin = bisect.bisect_left(self._termes, prefixe + "\U0010ffff", debut)
+            meilleurs = heapq.nlargest(limite, (self._entrees[terme] for terme in self._termes[debut:fin]),
+                                       key=lambda entree: entree[1])
+            return [tuple(entree) for entree in meilleurs]
+
+    def __len__(self):
+        return len(self._termes)
+
+
+@st.cache_resource
+def get_index_mots_cles():
+    index = IndexPrefixesMotsCles()
+    with get_db_connection() as conn:
+        index.charger(conn)
+    return index
+
+
+# Quasi-doublons : signatures MinHash des analyses et index LSH (bandes de la signature)
+DOUBLONS_SEUIL = float(os.environ.get("CNA_DOUBLONS_SEUIL", "0.8"))
+DOUBLONS_CANDIDATS_MAX = 1000
+# Identifiants par clause IN lors de la lecture du détail des doublons
+DOUBLONS_IDS_PAR_REQUETE = 500
+MINHASH_PERMUTATIONS = 64
+MINHASH_TAILLE_SHINGLE = 5
+MINHASH_PREMIER = (1 << 31) - 1
+LSH_BANDES = 16
+
+
+def _coefficients_minhash(graine):
+    # Dérivés de SHA-256 : les signatures stockées restent valables d'une version à l'autre
+    return np.array([
+        int.from_bytes(hashlib.sha256(f"{graine}:{i}".encode()).digest()[:8], "big") % (MINHASH_PREMIER - 1) + 1
+        for i in range(MINHASH_PERMUTATIONS)
+    ], dtype=np.uint64)[:, None]
+
+
+MINHASH_A = _coefficients_minhash("a")
+MINHASH_B = _coefficients_minhash("b")
+
+
+def signature_minhash(texte):
+    """Signature MinHash des shingles de caractères de l'analyse normalisée (None si l'analyse est vide)"""
+    texte = normaliser_mot_cle(texte or "")
+    if not texte:
+        return None
+    shingles = {texte[i:i + MINHASH_TAILLE_SHINGLE]
+                for i in range(max(len(texte) - MINHASH_TAILLE_SHINGLE + 1, 1))}
+    empreintes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+    return ((MINHASH_A * empreintes + MINHASH_B) % MINHASH_PREMIER).min(axis=1).astype(np.uint32)
+
+
+def cles_lsh(signature):
+    """Clé de seau de chaque bande de la signature"""
+    lignes = MINHASH_PERMUTATIONS // LSH_BANDES
+    return [
+        int.from_bytes(hashlib.blake2b(bytes([bande]) + signature[bande * lignes:(bande + 1) * lignes].tobytes(),
+                                       digest_size=8).digest(), "big", signed=True)
+        for bande in range(LSH_BANDES)
+    ]
+
+
+def similarite_minhash(signature, autres):
+    """Similarité de Jaccard estimée entre une signature et une ou plusieurs autres"""
+    return (autres == signature).mean(axis=-1)
+
+
+def indexer_minhash(conn, lignes):
+    """Enregistre signature et seaux LSH de dossiers nouvellement insérés [(id, fonds_id, objet_id, analyse)]"""
+    signatures = []
+    seaux = []
+    for dossier_id, fonds_id, objet_id, analyse in lignes:
+        # Sans fonds ou sans objet, un dossier n'a pas de périmètre de comparaison
+        if fonds_id is None or objet_id is None:
+            continue
+        signature = signature_minhash(analyse)
+        if signature is None:
+            continue
+        signatures.append((dossier_id, fonds_id, objet_id, signature.tobytes()))
+        seaux.extend((fonds_id, objet_id, cle, dossier_id) for cle in cles_lsh(signature))
+    conn.executemany('INSERT OR REPLACE INTO dossiers_minhash (dossier_id, fonds_id, objet_id, signature) '
+                     'VALUES (?, ?, ?, ?)', signatures)
+    conn.executemany('INSERT OR IGNORE INTO dossiers_lsh (fonds_id, objet_id, cle, dossier_id) VALUES (?, ?, ?, ?)',
+                     seaux)
+
+
+def _details_doublons(conn, ids):
+    """Fonds, objet, analyse, archiviste et date de traitement de dossiers donnés"""
+    details = []
+    for debut in range(0, len(ids), DOUBLONS_IDS_PAR_REQUETE):
+        lot = ids[debut:debut + DOUBLONS_IDS_PAR_REQUETE]
+        details.append(pd.read_sql_query(f'''
+            SELECT d.id, f.nom as fonds, o.nom as objet, d.analyse, u.username as archiviste, d.date_traitement
+            FROM {source_dossiers()}
+            WHERE d.id IN ({','.join('?' * len(lot))})
+        ''', conn, params=lot))
+    return pd.concat(details, ignore_index=True)
+
+
+def quasi_doublons(conn, fonds_id, objet_id, analyse, seuil=DOUBLONS_SEUIL, limite=5):
+    """Dossiers du même fonds et du même objet dont l'analyse est quasi identique, les plus proches d'abord"""
+    signature = signature_minhash(analyse)
+    if signature is None:
+        return pd.DataFrame()
+    cles = cles_lsh(signature)
+    candidats = conn.execute(f'''
+        SELECT dossier_id, signature FROM dossiers_minhash
+        WHERE dossier_id IN (
+            -- Un dossier partageant plusieurs bandes ne compte qu'une fois dans la limite
+            SELECT DISTINCT dossier_id FROM dossiers_lsh
+            WHERE fonds_id = ? AND objet_id = ? AND cle IN ({','.join('?' * len(cles))})
+            LIMIT ?
+        )
+    ''', [fonds_id, objet_id, *cles, DOUBLONS_CANDIDATS_MAX]).fetchall()
+    if not candidats:
+        return pd.DataFrame()
+
+    similarites = similarite_minhash(signature, np.frombuffer(b"".join(sig for _, sig in candidats), dtype=np.uint32)
+                                     .reshape(len(candidats), MINHASH_PERMUTATIONS))
+    proches = sorted(((similarite, dossier_id) for (dossier_id, _), similarite in zip(candidats, similarites)
+                      if similarite >= seuil), reverse=True)[:limite]
+    if not proches:
+        return pd.DataFrame()
+
+    details = _details_doublons(conn, [dossier_id for _, dossier_id in proches])
+    details['similarite'] = details['id'].map({dossier_id: similarite for similarite, dossier_id in proches})
+    return details.sort_values('similarite', ascending=False, ignore_index=True)
+
+
+def grappes_quasi_doublons(conn, seuil=DOUBLONS_SEUIL):
+    """Parcourt les seaux LSH partagés de toute la base et regroupe les dossiers quasi identiques en grappes"""
+    parents = {}
+
+    def racine(dossier_id):
+        while parents.setdefault(dossier_id, dossier_id) != dossier_id:
+            parents[dossier_id] = parents[parents[dossier_id]]
+            dossier_id = parents[dossier_id]
+        return dossier_id
+
+    # Seaux d'au moins deux dossiers, lus dans l'ordre de la clé primaire
+    lecture = conn.execute('''
+        SELECT l.fonds_id, l.objet_id, l.cle, l.dossier_id, m.signature
+        FROM dossiers_lsh l
+        JOIN (
+            SELECT fonds_id, objet_id, cle FROM dossiers_lsh
+            GROUP BY fonds_id, objet_id, cle
+            HAVING COUNT(*) > 1
+        ) s ON s.fonds_id = l.fonds_id AND s.objet_id = l.objet_id AND s.cle = l.cle
+        JOIN dossiers_minhash m ON m.dossier_id = l.dossier_id
+        ORDER BY l.fonds_id, l.objet_id, l.cle
+    ''')
+    for _, seau in itertools.groupby(lecture, key=lambda ligne: ligne[:3]):
+        seau = list(seau)
+        ids = [ligne[3] for ligne in seau]
+        signatures = np.frombuffer(b"".join(ligne[4] for ligne in seau), dtype=np.uint32).reshape(len(seau), -1)
+        for i in range(len(ids) - 1):
+            # Comparaison vectorisée avec les dossiers suivants du seau
+            for j in np.flatnonzero(similarite_minhash(signatures[i], signatures[i + 1:]) >= seuil):
+                a, b = racine(ids[i]), racine(ids[i + 1 + j])
+                if a != b:
+                    parents[max(a, b)] = min(a, b)
+
+    grappes = {}
+    for dossier_id in parents:
+        grappes.setdefault(racine(dossier_id), []).append(dossier_id)
+    grappes = {grappe: membres for grappe, membres in grappes.items() if len(membres) > 1}
+    if not grappes:
+        return pd.DataFrame()
+
+    details = _details_doublons(conn, sorted(itertools.chain.from_iterable(grappes.values())))
+    details.insert(0, 'grappe', details['id'].map(racine))
+    return details.sort_values(['grappe', 'id'], ignore_index=True)
+
+
+# Partitions annuelles : les dossiers archivés vivent dans un fichier SQLite attaché par année
+COLONNES_TABLE_DOSSIERS = (
+    "id", "fonds_id", "objet_id", "analyse", "mots_cles", "date_debut", "date_fin",
+    "archiviste_id", "date_traitement", "temps_saisie", "jour_traitement",
+)
+
+
+def schema_partition(annee):
+    return f"cna_{int(annee)}"
+
+
+def partitions_periode(bornes=(None, None), partitions=None):
+    """Schémas des partitions dont l'année recoupe l'intervalle [début, fin) ; les autres sont élaguées"""
+    if partitions is None:
+        partitions = get_connection_pool().partitions
+    debut, fin = bornes
+    return [
+        schema_partition(annee) for annee in sorted(partitions)
+        if (debut is None or debut.year <= annee) and (fin is None or fin > datetime(annee, 1, 1).date())
+    ]
+
+
+def table_dossiers(bornes=(None, None), partitions=None):
+    """Table des dossiers, ou union de la base courante et des partitions utiles à la période"""
+    schemas = partitions_periode(bornes, partitions)
+    if not schemas:
+        return "dossiers"
+    colonnes = ", ".join(COLONNES_TABLE_DOSSIERS)
+    return "(" + " UNION ALL ".join(
+        f"SELECT {colonnes} FROM {schema}.dossiers" for schema in ["main"] + schemas
+    ) + ")"
+
+
+# Requêtes des pages de consultation (recherche et tableau des saisies)
+JOINTURES_DOSSIERS = '''
+    JOIN fonds f ON d.fonds_id = f.id
+    JOIN objets o ON d.objet_id = o.id
+    JOIN users u ON d.archiviste_id = u.id
+'''
+
+
+def source_dossiers(bornes=(None, None), partitions=None):
+    """Dossiers (alias d) joints à leurs fonds, objets et archivistes, partitions élaguées selon la période"""
+    return f"{table_dossiers(bornes, partitions)} d {JOINTURES_DOSSIERS}"
+
+
+def source_dossiers_fts(partitions=None):
+    """Correspondances plein texte de chaque index (base courante et partitions) ; un paramètre MATCH par index"""
+    schemas = ["main"] + partitions_periode(partitions=partitions)
+    colonnes = ", ".join(f"d.{colonne}" for colonne in COLONNES_TABLE_DOSSIERS)
+    branches = [f'''
+        SELECT {colonnes},
+            bm25(dossiers_fts, 1.0, 2.0) as score,
+            snippet(dossiers_fts, 0, '{FTS_DEBUT_SURLIGNAGE}', '{FTS_FIN_SURLIGNAGE}', '…', 40) as extrait_analyse,
+            highlight(dossiers_fts, 1, '{FTS_DEBUT_SURLIGNAGE}', '{FTS_FIN_SURLIGNAGE}') as extrait_mots_cles
+        FROM {schema}.dossiers_fts
+        JOIN {schema}.dossiers d ON d.id = dossiers_fts.rowid
+        WHERE dossiers_fts MATCH ?
+    ''' for schema in schemas]
+    return f"({' UNION ALL '.join(branches)}) d {JOINTURES_DOSSIERS}", len(branches)
+
+
+COLONNES_RECHERCHE = '''
+    d.id,
+    f.nom as fonds,
+    o.nom as objet,
+    d.analyse,
+    d.mots_cles,
+    d.date_debut,
+    d.date_fin,
+    u.username as archiviste,
+    d.date_traitement,
+    d.temps_saisie
+'''
+
+# Extraits surlignés ajoutés aux colonnes affichées en mode plein texte (calculés par source_dossiers_fts)
+COLONNES_EXTRAITS_FTS = ''',
+    d.extrait_analyse,
+    d.extrait_mots_cles
+'''
+
+COLONNES_SAISIES = '''
+    d.id,
+    f.nom as fonds,
+    o.nom as objet,
+    d.analyse,
+    d.mots_cles,
+    d.date_debut,
+    d.date_fin,
+    u.username as archiviste,
+    d.jour_traitement as date_saisie,
+    TIME(d.date_traitement) as heure_saisie,
+    d.temps_saisie
+'''
+
+
+# Facettes de la recherche : nom -> expression SQL sur la source des dossiers
+FACETTES_RECHERCHE = {
+    "fonds": "f.nom",
+    "objet": "o.nom",
+    "archiviste": "u.username",
+    "annee": "substr(d.date_debut, 1, 4)",
+}
+# Argument de requete_recherche correspondant à chaque facette
+ARGUMENTS_FACETTES = {"fonds": "fonds", "objet": "objets", "archiviste": "archivistes", "annee": "annees"}
+# Au-delà, les facettes sont comptées par une agrégation chacune plutôt que par un cube en mémoire
+FACETTES_CUBE_MAX = 20000
+FACETTES_EN_CACHE = 16
+
+
+def requete_recherche(requete_fts="", fonds=(), objets=(), archivistes=(), date_debut=None, date_fin=None,
+                      mots_cles_ids=(), annees=()):
+    """Retourne (source, filtres, paramètres, tri) de la recherche de dossiers"""
+    if requete_fts:
+        source, nb_index = source_dossiers_fts()
+        filtres = "1=1"
+        params = [requete_fts] * nb_index
+        # Score bm25 : les mots-clés pèsent deux fois plus que l'analyse
+        tri = ("d.score", "ASC")
+    else:
+        source = source_dossiers()
+        filtres = "1=1"
+        params = []
+        tri = TRIS_SAISIES["Date (récent)"]
+
+    for nom, valeurs in (("fonds", fonds), ("objet", objets), ("archiviste", archivistes), ("annee", annees)):
+        colonne = FACETTES_RECHERCHE[nom]
+        if valeurs:
+            placeholders = ",".join(["?" for _ in valeurs])
+            filtres += f" AND {colonne} IN ({placeholders})"
+            params.extend(valeurs)
+
+    if mots_cles_ids:
+        filtre, params_mots_cles = filtre_mots_cles(mots_cles_ids)
+        filtres += f" AND {filtre}"
+        params.extend(params_mots_cles)
+
+    if date_debut:
+        filtres += " AND d.date_debut >= ?"
+        params.append(date_debut)
+
+    if date_fin:
+        filtres += " AND d.date_fin <= ?"
+        params.append(date_fin)
+
+    return source, filtres, params, tri
+
+
+def cube_facettes(conn, source, filtres, params, limite=None):
+    """Nombre de dossiers par combinaison de facettes en une seule agrégation (None au-delà de `limite` combinaisons)"""
+    limite = FACETTES_CUBE_MAX if limite is None else limite
+    colonnes = ", ".join(f"{expression} as {nom}" for nom, expression in FACETTES_RECHERCHE.items())
+    groupes = ", ".join(str(i) for i in range(1, len(FACETTES_RECHERCHE) + 1))
+    cube = pd.read_sql_query(f"SELECT {colonnes}, COUNT(*) as nb FROM {source} WHERE {filtres} GROUP BY {groupes} "
+                             f"LIMIT ?", conn, params=[*params, limite + 1])
+    return None if len(cube) > limite else cube
+
+
+def compter_facettes(cube, selections):
+    """Retourne (comptes par valeur de chaque facette, total) ; chaque facette tient compte des autres sélections"""
+    masques = {nom: cube[nom].isin(valeurs) for nom, valeurs in selections.items() if valeurs}
+    tout = pd.Series(True, index=cube.index)
+
+    comptes = {}
+    for nom in FACETTES_RECHERCHE:
+        masque = tout.copy()
+        for autre, masque_autre in masques.items():
+            if autre != nom:
+                masque &= masque_autre
+        comptes[nom] = cube.loc[masque].groupby(nom)['nb'].sum().sort_values(ascending=False)
+
+    for masque_facette in masques.values():
+        tout &= masque_facette
+    return comptes, int(cube.loc[tout, 'nb'].sum())
+
+
+class CacheFacettes:
+    """Derniers comptes de facettes calculés, partagés entre sessions et indexés par requête"""
+
+    def __init__(self, max_entrees=FACETTES_EN_CACHE):
+        self._entrees = OrderedDict()
+        self._max_entrees = max_entrees
+        self._lock = threading.Lock()
+
+    def obtenir(self, cle, calculer):
+        with self._lock:
+            if cle in self._entrees:
+                self._entrees.move_to_end(cle)
+                return self._entrees[cle]
+
+        valeur = calculer()
+        with self._lock:
+            self._entrees[cle] = valeur
+            while len(self._entrees) > self._max_entrees:
+                self._entrees.popitem(last=False)
+        return valeur
+
+
+@st.cache_resource
+def get_cache_facettes():
+    return CacheFacettes()
+
+
+def compter_facettes_recherche(conn, requete_fts="", date_debut=None, date_fin=None, mots_cles_ids=(),
+                               selections=None, cache=None):
+    """Retourne (comptes par valeur de chaque facette, total) pour une recherche et les sélections de facettes"""
+    selections = {nom: list(valeurs) for nom, valeurs in (selections or {}).items() if valeurs}
+    base = {"date_debut": date_debut, "date_fin": date_fin, "mots_cles_ids": mots_cles_ids}
+    source, filtres, params, _ = requete_recherche(requete_fts, **base)
+    signature = (source, filtres, tuple(map(str, params)), version_donnees(conn))
+    cache = cache or get_cache_facettes()
+
+    # Peu de combinaisons : une seule agrégation, partagée, puis les comptes de chaque sélection en mémoire
+    cube = cache.obtenir(signature, lambda: cube_facettes(conn, source, filtres, params))
+    if cube is not None:
+        return compter_facettes(cube, selections)
+
+    # Sinon une agrégation par facette, les sélections des autres facettes appliquées en SQL
+    def calculer():
+        comptes = {}
+        for nom, expression in FACETTES_RECHERCHE.items():
+            autres = {ARGUMENTS_FACETTES[autre]: valeurs for autre, valeurs in selections.items() if autre != nom}
+            source_facette, filtres_facette, params_facette, _ = requete_recherche(requete_fts, **base, **autres)
+            comptes[nom] = pd.read_sql_query(f'''
+                SELECT {expression} as {nom}, COUNT(*) as nb
+                FROM {source_facette}
+                WHERE {filtres_facette} AND {expression} IS NOT NULL
+                GROUP BY 1
+                ORDER BY nb DESC
+            ''', conn, params=params_facette).set_index(nom)['nb']
+
+        # Total : comptes du fonds (toujours renseigné) restreints à sa propre sélection
+        compte_fonds = comptes["fonds"]
+        if "fonds" in selections:
+            compte_fonds = compte_fonds[compte_fonds.index.isin(selections["fonds"])]
+        return comptes, int(compte_fonds.sum())
+
+    return cache.obtenir((signature, tuple(sorted((nom, tuple(valeurs)) for nom, valeurs in selections.items()))),
+                         calculer)
+
+
+def requete_saisies(bornes, archiviste_id=None, archiviste=None, fonds=None):
+    """Retourne (source, filtres, paramètres) du tableau des saisies, limités aux partitions de la période"""
+    source = source_dossiers(bornes)
+    filtres = "1=1"
+    params = []
+
+    # Filtre de période (plage semi-ouverte sur le jour indexé)
+    filtre_jour, params_jour = filtre_periode('d.jour_traitement', bornes)
+    if filtre_jour:
+        filtres += f" AND {filtre_jour}"
+        params.extend(params_jour)
+
+    if archiviste_id is not None:
+        filtres += " AND d.archiviste_id = ?"
+        params.append(archiviste_id)
+    elif archiviste:
+        filtres += " AND u.username = ?"
+        params.append(archiviste)
+
+    if fonds:
+        filtres += " AND f.nom = ?"
+        params.append(fonds)
+
+    return source, filtres, params
+
+
+def resume_saisies(conn, source, filtres, params):
+    """Comptage et statistiques rapides (total, temps moyen, temps total, fonds distincts) calculés en base"""
+    return conn.execute(f'''
+        SELECT
+            COUNT(*),
+            AVG(d.temps_saisie),
+            SUM(d.temps_saisie),
+            COUNT(DISTINCT d.fonds_id)
+        FROM {source}
+        WHERE {filtres}
+    ''', params).fetchone()
+
+
+# Affichage des résultats de recherche
+RECHERCHE_TAILLES_PAGE = [10, 25, 50, 100, 250]
+FACETTES_VALEURS_AFFICHEES = 5
+
+
+def _texte_carte(valeur, defaut="—"):
+    """Valeur échappée pour le HTML, ou `defaut` si elle est absente"""
+    if valeur is None or (isinstance(valeur, float) and pd.isna(valeur)) or valeur == "":
+        return defaut
+    return html.escape(str(valeur)).replace("\n", "<br>")
+
+
+def rendre_cartes_resultats(resultats, plein_texte=False):
+    """Construit en un seul fragment HTML échappé les cartes d'une page de résultats"""
+    cartes = []
+    for row in resultats.itertuples(index=False):
+        if plein_texte:
+            # Extraits déjà échappés, seuls les marqueurs de surlignage deviennent des balises
+            analyse = surligner_extrait(row.extrait_analyse).replace("\n", "<br>") or "—"
+            mots_cles = surligner_extrait(row.extrait_mots_cles).replace("\n", "<br>") or "Aucun"
+        else:
+            analyse = _texte_carte(row.analyse)
+            mots_cles = _texte_carte(row.mots_cles, "Aucun")
+
+        temps = row.temps_saisie
+        temps = f"{temps:.0f} min" if temps is not None and not pd.isna(temps) else "—"
+
+        # Une carte par ligne, sans ligne vide : le bloc reste un unique bloc HTML pour le rendu Markdown
+        cartes.append(
+            '<div class="carte-resultat">'
+            f'<h4>📁 {_texte_carte(row.fonds)} - {_texte_carte(row.objet)}</h4>'
+            f'<p><strong>Analyse:</strong> {analyse}</p>'
+            f'<p><strong>Mots-clés:</strong> {mots_cles}</p>'
+            '<div class="carte-meta">'
+            f'<span>📅 {_texte_carte(row.date_debut)} - {_texte_carte(row.date_fin)}</span>'
+            f'<span>👤 {_texte_carte(row.archiviste)}</span>'
+            f'<span>🕒 {_texte_carte(row.date_traitement)}</span>'
+            f'<span>⏱️ {temps}</span>'
+            '</div></div>'
+        )
+    return '<div class="resultats-recherche">' + "\n".join(cartes) + '</div>'
+
+
+# Export CSV en flux
+EXPORT_TAILLE_LOT = 5000
+EXPORT_SEUIL_MEMOIRE = 8 * 1024 * 1024
+
+EXPORT_COMPLET_QUERY = '''
+    SELECT
+        d.id,
+        d.fonds_id,
+        d.objet_id,
+        d.analyse,
+        d.mots_cles,
+        d.date_debut,
+        d.date_fin,
+        d.archiviste_id,
+        d.date_traitement,
+        d.temps_saisie,
+        f.nom as fonds_nom,
+        o.nom as objet_nom,
+        u.username as archiviste_nom
+    FROM {source}
+    ORDER BY d.date_traitement DESC
+'''
+
+
+def requete_export_complet():
+    """Export de tous les dossiers, partitions d'archives comprises"""
+    return EXPORT_COMPLET_QUERY.format(source=source_dossiers())
+
+
+def exporter_csv(conn, query, params=(), compresser=False):
+    """Écrit le résultat d'une requête en CSV par lots dans un fichier temporaire (gzip optionnel)"""
+    fichier = tempfile.SpooledTemporaryFile(max_size=EXPORT_SEUIL_MEMOIRE)
+    flux = gzip.GzipFile(fileobj=fichier, mode='wb') if compresser else fichier
+    texte = io.TextIOWrapper(flux, encoding='utf-8', newline='')
+    writer = csv.writer(texte, lineterminator='\n')
+
+    cursor = conn.execute(query, list(params))
+    writer.writerow([colonne[0] for colonne in cursor.description])
+    while True:
+        lignes = cursor.fetchmany(EXPORT_TAILLE_LOT)
+        if not lignes:
+            break
+        writer.writerows(lignes)
+
+    # Détacher le wrapper sans fermer le fichier, puis finaliser le flux gzip
+    texte.flush()
+    texte.detach()
+    if compresser:
+        flux.close()
+
+    fichier.seek(0)
+    return fichier
+
+
+# Export Parquet partitionné par année
+COLONNES_CATEGORIELLES = {"fonds_nom", "objet_nom", "archiviste_nom"}
+COLONNES_DATES = {"date_debut": "%Y-%m-%d", "date_fin": "%Y-%m-%d"}
+
+PARQUET_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("fonds_id", pa.int64()),
+    ("objet_id", pa.int64()),
+    ("analyse", pa.string()),
+    ("mots_cles", pa.string()),
+    ("date_debut", pa.date32()),
+    ("date_fin", pa.date32()),
+    ("archiviste_id", pa.int64()),
+    ("date_traitement", pa.timestamp("s")),
+    ("temps_saisie", pa.int64()),
+    ("fonds_nom", pa.dictionary(pa.int32(), pa.string())),
+    ("objet_nom", pa.dictionary(pa.int32(), pa.string())),
+    ("archiviste_nom", pa.dictionary(pa.int32(), pa.string())),
+])
+
+
+def _lot_parquet(lignes, noms):
+    """Convertit un lot de lignes SQLite en RecordBatch typé selon PARQUET_SCHEMA"""
+    colonnes = list(zip(*lignes))
+    arrays = []
+
+    for nom, valeurs in zip(noms, colonnes):
+        type_cible = PARQUET_SCHEMA.field(nom).type
+        if nom in COLONNES_CATEGORIELLES:
+            arrays.append(pa.array(valeurs, pa.string()).dictionary_encode().cast(type_cible))
+        elif nom in COLONNES_DATES or nom == "date_traitement":
+            textes = pa.array([str(v)[:19] if v is not None else None for v in valeurs], pa.string())
+            format_date = COLONNES_DATES.get(nom, "%Y-%m-%d %H:%M:%S")
+            dates = pc.strptime(textes, format=format_date, unit="s", error_is_null=True)
+            arrays.append(dates.cast(type_cible))
+        else:
+            arrays.append(pa.array(valeurs, type_cible))
+
+    return pa.RecordBatch.from_arrays(arrays, schema=PARQUET_SCHEMA)
+
+
+def exporter_parquet(conn, query=None):
+    """Écrit les dossiers en Parquet partitionné par année de traitement, dans une archive ZIP"""
+    query = query or requete_export_complet()
+    archive = tempfile.SpooledTemporaryFile(max_size=EXPORT_SEUIL_MEMOIRE)
+
+    with tempfile.TemporaryDirectory() as dossier:
+        cursor = conn.execute(query)
+        noms = [colonne[0] for colonne in cursor.description]
+        index_date = noms.index("date_traitement")
+
+        parties = {}
+        annee_courante = None
+        writer = None
+
+        try:
+            while True:
+                lignes = cursor.fetchmany(EXPORT_TAILLE_LOT)
+                if not lignes:
+                    break
+
+                # Les lignes arrivent triées par date : chaque changement d'année ouvre une partition
+                for annee, groupe in itertools.groupby(lignes, key=lambda l: str(l[index_date] or "")[:4] or "inconnue"):
+                    if annee != annee_courante:
+                        if writer is not None:
+                            writer.close()
+                        parties[annee] = parties.get(annee, -1) + 1
+                        chemin = os.path.join(dossier, f"annee={annee}", f"part-{parties[annee]}.parquet")
+                        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+                        writer = pq.ParquetWriter(chemin, PARQUET_SCHEMA, compression="zstd",
+                                                  use_dictionary=sorted(COLONNES_CATEGORIELLES))
+                        annee_courante = annee
+
+                    # Un groupe de lignes Parquet par lot lu en base
+                    writer.write_batch(_lot_parquet(list(groupe), noms))
+        finally:
+            if writer is not None:
+                writer.close()
+
+        # Les fichiers Parquet sont déjà compressés : l'archive les stocke tels quels
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zf:
+            for racine, _, fichiers in os.walk(dossier):
+                for nom_fichier in sorted(fichiers):
+                    chemin = os.path.join(racine, nom_fichier)
+                    zf.write(chemin, os.path.join("dossiers", os.path.relpath(chemin, dossier)))
+
+    archive.seek(0)
+    return archive
+
+
 def display_header(title, subtitle):
     """Affiche l'en-tête standardisé avec logo CNA"""
     st.markdown(f'''
@@ -314,74 +2178,370 @@ def display_header(title, subtitle):
     ''', unsafe_allow_html=True)
 
 
-# Fonction pour générer l'analyse des statistiques
-def generer_analyse_statistiques():
-    with get_db_connection() as conn:
-        # Données pour l'analyse
-        total_dossiers = pd.read_sql_query('SELECT COUNT(*) as count FROM dossiers', conn).iloc[0]['count']
-
-        # Analyse par période
-        stats_hebdo = pd.read_sql_query('''
-            SELECT 
-                COUNT(*) as dossiers_semaine,
-                AVG(temps_saisie) as temps_moyen_semaine
-            FROM dossiers 
-            WHERE date_traitement >= date('now', '-7 days')
-        ''', conn)
-
-        stats_mensuel = pd.read_sql_query('''
-            SELECT 
-                COUNT(*) as dossiers_mois,
-                AVG(temps_saisie) as temps_moyen_mois
-            FROM dossiers 
-            WHERE date_traitement >= date('now', '-30 days')
-        ''', conn)
-
-        # Performance par archiviste
-        perf_archivistes = pd.read_sql_query('''
-            SELECT 
+# Moteurs analytiques : lectures des statistiques sur SQLite ou sur une copie DuckDB des agrégats
+MOTEUR_ANALYTIQUE = os.environ.get("CNA_MOTEUR_ANALYTIQUE", "sqlite").lower()
+DUCKDB_SYNCHRO_SECONDES = int(os.environ.get("CNA_DUCKDB_SYNCHRO", "30"))
+
+# Tables copiées dans DuckDB : (schéma DuckDB, lecture SQLite). Les agrégats sont relus par jour modifié,
+# les petites tables de référence entièrement quand leur empreinte change
+DUCKDB_TABLE_JOURNALIERE = "stats_journalieres"
+DUCKDB_TABLES = {
+    "stats_journalieres": (
+        "jour VARCHAR, archiviste_id BIGINT, fonds_id BIGINT, objet_id BIGINT, "
+        "nb_dossiers BIGINT, somme_temps BIGINT, nb_temps BIGINT",
+        "SELECT jour, archiviste_id, fonds_id, objet_id, nb_dossiers, somme_temps, nb_temps FROM stats_journalieres",
+    ),
+    "users": ("id BIGINT, username VARCHAR, role VARCHAR", "SELECT id, username, role FROM users"),
+    "fonds": ("id BIGINT, nom VARCHAR", "SELECT id, nom FROM fonds"),
+}
+
+
+class LecteurSQLite:
+    """Lectures analytiques sur une connexion SQLite, dans une transaction de lecture"""
+
+    nom = "SQLite"
+    # Lundi de la semaine d'un jour au format AAAA-MM-JJ
+    sql_debut_semaine = "date({}, '-6 days', 'weekday 1')"
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @contextmanager
+    def instantane(self):
+        # Transaction de lecture : les requêtes du bloc voient le même état de la base
+        transaction = not self.conn.in_transaction
+        if transaction:
+            self.conn.execute("BEGIN")
+        try:
+            yield self
+        finally:
+            if transaction:
+                self.conn.commit()
+
+    def lire(self, sql, params=()):
+        return pd.read_sql_query(sql, self.conn, params=list(params))
+
+
+class MoteurDuckDB:
+    """Copie DuckDB en mémoire des agrégats journaliers, mise à jour périodiquement depuis SQLite"""
+
+    nom = "DuckDB"
+
+    def __init__(self, pool, intervalle=DUCKDB_SYNCHRO_SECONDES):
+        self._pool = pool
+        self._intervalle = intervalle
+        self._duck = duckdb.connect()
+        for table, (schema, _) in DUCKDB_TABLES.items():
+            self._duck.execute(f"CREATE TABLE {table} ({schema})")
+        self.version = None
+        self.synchronise_le = None
+        self._sequence = 0
+        self._empreintes = {}
+        self._prochaine_verification = 0.0
+        self._lock = threading.Lock()
+
+    def synchroniser(self, forcer=False):
+        """Reporte dans la copie les changements des données SQLite depuis la dernière synchronisation.
+
+        La première synchronisation (ou une synchronisation forcée) recopie tout ; les suivantes ne
+        relisent que les jours d'agrégats modifiés depuis et les tables de référence qui ont changé.
+        """
+        # Une seule synchronisation à la fois ; les autres lecteurs utilisent la copie courante
+        if not self._lock.acquire(blocking=self.version is None):
+            return
+        try:
+            if not forcer and time.monotonic() < self._prochaine_verification:
+                return
+            complete = forcer or self.version is None
+            with self._pool.connection() as conn, LecteurSQLite(conn).instantane() as sqlite:
+                version = version_donnees(conn)
+                if version == self.version and not complete:
+                    self._prochaine_verification = time.monotonic() + self._intervalle
+                    return
+                sequence = conn.execute(
+                    "SELECT IFNULL(MAX(sequence), 0) FROM stats_journalieres_modifiees"
+                ).fetchone()[0]
+                empreintes = {
+                    table: conn.execute(f"SELECT COUNT(*) || ':' || IFNULL(MAX(id), 0) FROM {table}").fetchone()[0]
+                    for table in DUCKDB_TABLES if table != DUCKDB_TABLE_JOURNALIERE
+                }
+                tables = {
+                    table: sqlite.lire(lecture) for table, (_, lecture) in DUCKDB_TABLES.items()
+                    if complete or (table != DUCKDB_TABLE_JOURNALIERE
+                                    and empreintes[table] != self._empreintes.get(table))
+                }
+                jours = None
+                if not complete:
+                    jours = sqlite.lire("SELECT jour FROM stats_journalieres_modifiees WHERE sequence > ?",
+                                        [self._sequence])
+                    if not jours.empty:
+                        tables[DUCKDB_TABLE_JOURNALIERE] = sqlite.lire(
+                            f"{DUCKDB_TABLES[DUCKDB_TABLE_JOURNALIERE][1]} WHERE jour IN "
+                            "(SELECT jour FROM stats_journalieres_modifiees WHERE sequence > ?)", [self._sequence]
+                        )
+
+            # Mise à jour des copies dans une transaction DuckDB : les lectures en cours gardent leur instantané
+            duck = self._duck.cursor()
+            try:
+                duck.execute("BEGIN TRANSACTION")
+                for table, donnees in tables.items():
+                    if table == DUCKDB_TABLE_JOURNALIERE and jours is not None:
+                        # Les lignes des jours modifiés sont remplacées, y compris celles supprimées dans SQLite
+                        duck.register("_jours", jours)
+                        duck.execute(f"DELETE FROM {table} WHERE jour IN (SELECT jour FROM _jours)")
+                        duck.unregister("_jours")
+                    else:
+                        duck.execute(f"DELETE FROM {table}")
+                    if not donnees.empty:
+                        duck.register("_synchro", donnees)
+                        duck.execute(f"INSERT INTO {table} SELECT * FROM _synchro")
+                        duck.unregister("_synchro")
+                duck.execute("COMMIT")
+            finally:
+                duck.close()
+
+            self._sequence = sequence
+            self._empreintes = empreintes
+            self.version = version
+            self.synchronise_le = datetime.now()
+            self._prochaine_verification = time.monotonic() + self._intervalle
+        finally:
+            self._lock.release()
+
+    @contextmanager
+    def instantane(self):
+        self.synchroniser()
+        duck = self._duck.cursor()
+        try:
+            duck.execute("BEGIN TRANSACTION")
+            yield _LecteurDuckDB(duck)
+            duck.execute("COMMIT")
+        finally:
+            duck.close()
+
+
+class _LecteurDuckDB:
+    sql_debut_semaine = "strftime(date_trunc('week', CAST({} AS DATE)), '%Y-%m-%d')"
+
+    def __init__(self, duck):
+        self._duck = duck
+
+    def lire(self, sql, params=()):
+        return self._duck.execute(sql, list(params)).df()
+
+
+def lecteur_analytique(source):
+    """Interface de lecture (instantane / lire) d'une connexion SQLite ou d'un moteur analytique"""
+    return LecteurSQLite(source) if isinstance(source, sqlite3.Connection) else source
+
+
+@st.cache_resource
+def get_moteur_statistiques():
+    """Moteur DuckDB des statistiques si configuré et installé, sinon None (lecture directe dans SQLite)"""
+    if MOTEUR_ANALYTIQUE != "duckdb" or duckdb is None:
+        return None
+    return MoteurDuckDB(get_connection_pool())
+
+
+# Indicateurs statistiques calculés en un seul instantané de la table d'agrégats
+@dataclass
+class MetriquesPeriode:
+    """Indicateurs clés d'une période, partagés par le tableau de bord, les statistiques et les rapports"""
+    periode: str
+    objectif: int
+    total_dossiers: int
+    total_periode: int
+    dossiers_aujourd_hui: int
+    dossiers_7j: int
+    temps_moyen_7j: float
+    dossiers_30j: int
+    temps_moyen_30j: float
+    moyenne_7j: float
+    journalier: pd.DataFrame
+    evolution: pd.DataFrame
+    evolution_7j: pd.DataFrame
+    archivistes: pd.DataFrame
+    fonds: pd.DataFrame
+
+    @property
+    def taux_objectif(self):
+        return self.dossiers_aujourd_hui / self.objectif * 100 if self.objectif > 0 else 0
+
+    @property
+    def rythme_7j(self):
+        """Dossiers par jour calendaire sur les 7 derniers jours (base des projections)"""
+        return self.dossiers_7j / 7
+
+
+def _jours_dans(journalier, bornes):
+    debut, fin = bornes
+    masque = pd.Series(True, index=journalier.index)
+    if debut is not None:
+        masque &= journalier['date'] >= debut.isoformat()
+    if fin is not None:
+        masque &= journalier['date'] < fin.isoformat()
+    return journalier[masque]
+
+
+def _cumul_jours(jours):
+    """Nombre de dossiers et temps moyen de saisie d'un ensemble de jours"""
+    nb_temps = jours['nb_temps'].sum()
+    return int(jours['count'].sum()), float(jours['somme_temps'].sum() / nb_temps) if nb_temps else 0.0
+
+
+def calculer_metriques(conn, periode="Toutes les données", objectif=None):
+    """Calcule tous les indicateurs d'une période en trois lectures d'un même instantané (SQLite ou DuckDB)"""
+    if objectif is None:
+        objectif = get_objectif_quotidien()
+    bornes = bornes_periode(periode)
+    bornes_7j = bornes_periode("7 derniers jours")
+    filtre, params = filtre_periode('s.jour', bornes)
+    filtre_7j, params_7j = filtre_periode('s.jour', bornes_7j)
+    condition = filtre or "1 = 1"
+
+    # SQL commun à SQLite et DuckDB ; les sommes sont typées explicitement (entiers des deux côtés)
+    with lecteur_analytique(conn).instantane() as lecteur:
+        # Série quotidienne complète : totaux, jour courant et fenêtres glissantes en découlent
+        journalier = lecteur.lire('''
+            SELECT jour as date, CAST(SUM(nb_dossiers) AS BIGINT) as count,
+                   CAST(SUM(somme_temps) AS BIGINT) as somme_temps, CAST(SUM(nb_temps) AS BIGINT) as nb_temps
+            FROM stats_journalieres
+            GROUP BY jour
+            ORDER BY jour
+        ''')
+
+        archivistes = lecteur.lire(f'''
+            SELECT
                 u.username,
-                COUNT(d.id) as total_dossiers,
-                AVG(d.temps_saisie) as temps_moyen,
-                COUNT(CASE WHEN DATE(d.date_traitement) >= date('now', '-7 days') THEN 1 END) as dossiers_7j
+                CAST(IFNULL(SUM(CASE WHEN {condition} THEN s.nb_dossiers END), 0) AS BIGINT) as total_dossiers,
+                SUM(CASE WHEN {condition} THEN s.somme_temps END) * 1.0
+                    / NULLIF(SUM(CASE WHEN {condition} THEN s.nb_temps END), 0) as temps_moyen,
+                MIN(CASE WHEN {condition} THEN s.jour END) as premiere_saisie,
+                MAX(CASE WHEN {condition} THEN s.jour END) as derniere_saisie,
+                CAST(IFNULL(SUM(CASE WHEN {filtre_7j} THEN s.nb_dossiers END), 0) AS BIGINT) as dossiers_7j
             FROM users u
-            LEFT JOIN dossiers d ON u.id = d.archiviste_id
+            LEFT JOIN stats_journalieres s ON u.id = s.archiviste_id
             WHERE u.role = 'archiviste'
             GROUP BY u.id, u.username
             ORDER BY total_dossiers DESC
-        ''', conn)
+        ''', params * 5 + params_7j)
 
-        # Répartition par fonds
-        repartition_fonds = pd.read_sql_query('''
-            SELECT 
+        fonds = lecteur.lire(f'''
+            SELECT
                 f.nom,
-                COUNT(d.id) as count,
-                CASE 
-                    WHEN (SELECT COUNT(*) FROM dossiers) > 0 
-                    THEN ROUND(COUNT(d.id) * 100.0 / (SELECT COUNT(*) FROM dossiers), 2)
-                    ELSE 0
-                END as pourcentage
+                CAST(IFNULL(SUM(s.nb_dossiers), 0) AS BIGINT) as count,
+                SUM(s.somme_temps) * 1.0 / NULLIF(SUM(s.nb_temps), 0) as temps_moyen
             FROM fonds f
-            LEFT JOIN dossiers d ON f.id = d.fonds_id
+            LEFT JOIN stats_journalieres s ON f.id = s.fonds_id {'AND ' + filtre if filtre else ''}
             GROUP BY f.id, f.nom
             ORDER BY count DESC
-        ''', conn)
-
-        objectif = get_objectif_quotidien()
+        ''', params)
+
+    journalier['temps_moyen'] = journalier['somme_temps'] / journalier['nb_temps'].where(journalier['nb_temps'] > 0)
+    evolution = _jours_dans(journalier, bornes)
+    jours_7j = _jours_dans(journalier, bornes_7j)
+    total_periode = int(evolution['count'].sum())
+    fonds['pourcentage'] = (fonds['count'] * 100.0 / total_periode).round(2) if total_periode > 0 else 0.0
+
+    dossiers_7j, temps_moyen_7j = _cumul_jours(jours_7j)
+    dossiers_30j, temps_moyen_30j = _cumul_jours(_jours_dans(journalier, bornes_periode("30 derniers jours")))
+
+    return MetriquesPeriode(
+        periode=periode,
+        objectif=objectif,
+        total_dossiers=int(journalier['count'].sum()),
+        total_periode=total_periode,
+        dossiers_aujourd_hui=_cumul_jours(_jours_dans(journalier, bornes_periode("Aujourd'hui")))[0],
+        dossiers_7j=dossiers_7j,
+        temps_moyen_7j=temps_moyen_7j,
+        dossiers_30j=dossiers_30j,
+        temps_moyen_30j=temps_moyen_30j,
+        moyenne_7j=float(jours_7j['count'].mean()) if not jours_7j.empty else 0.0,
+        journalier=journalier,
+        evolution=evolution[['date', 'count', 'temps_moyen']].reset_index(drop=True),
+        evolution_7j=jours_7j[['date', 'count']].reset_index(drop=True),
+        archivistes=archivistes,
+        fonds=fonds,
+    )
+
+
+# Regroupement temporel des graphiques : jours par point de chaque granularité
+GRANULARITES = {
+    "Jour": 1,
+    "Semaine": 7,
+    "Mois": 30.4,
+    "Trimestre": 91.3,
+    "Année": 365.25,
+}
+GRAPHIQUES_POINTS_MAX = int(os.environ.get("CNA_GRAPHIQUES_POINTS_MAX", "200"))
+
+# Premier jour de la tranche contenant un jour AAAA-MM-JJ (SQL commun à SQLite et DuckDB, sauf la semaine)
+TRANCHES_SQL = {
+    "Jour": "{0}",
+    "Mois": "substr({0}, 1, 7) || '-01'",
+    "Trimestre": "substr({0}, 1, 5) || CASE WHEN substr({0}, 6, 2) <= '03' THEN '01' "
+                 "WHEN substr({0}, 6, 2) <= '06' THEN '04' WHEN substr({0}, 6, 2) <= '09' THEN '07' "
+                 "ELSE '10' END || '-01'",
+    "Année": "substr({0}, 1, 4) || '-01-01'",
+}
+
+
+def granularite_graphique(nb_jours, choix="Automatique", points_max=GRAPHIQUES_POINTS_MAX):
+    """Granularité la plus fine, au moins aussi large que celle choisie, tenant en points_max points"""
+    noms = list(GRANULARITES)
+    depart = 0 if choix == "Automatique" else noms.index(choix)
+    for nom in noms[depart:]:
+        if nb_jours / GRANULARITES[nom] <= points_max:
+            return nom
+    return noms[-1]
+
+
+def evolution_par_tranche(conn, periode="Toutes les données", choix="Automatique", points_max=GRAPHIQUES_POINTS_MAX):
+    """Dossiers et temps moyen par tranche de temps, agrégés en SQL : (granularité retenue, DataFrame)"""
+    filtre, params = filtre_periode('jour', bornes_periode(periode))
+    condition = filtre or "1 = 1"
+
+    with lecteur_analytique(conn).instantane() as lecteur:
+        # L'étendue réelle des données de la période détermine la granularité
+        etendue = lecteur.lire(f"SELECT MIN(jour) as debut, MAX(jour) as fin FROM stats_journalieres "
+                               f"WHERE {condition}", params)
+        debut, fin = etendue.iloc[0]
+        if pd.isna(debut):
+            return granularite_graphique(0, choix, points_max), pd.DataFrame(
+                columns=['date', 'count', 'temps_moyen'])
+
+        granularite = granularite_graphique(
+            (datetime.fromisoformat(fin) - datetime.fromisoformat(debut)).days + 1, choix, points_max
+        )
+        if granularite == "Semaine":
+            tranche = lecteur.sql_debut_semaine.format('jour')
+        else:
+            tranche = TRANCHES_SQL[granularite].format('jour')
+        evolution = lecteur.lire(f'''
+            SELECT {tranche} as date, CAST(SUM(nb_dossiers) AS BIGINT) as count,
+                   SUM(somme_temps) * 1.0 / NULLIF(SUM(nb_temps), 0) as temps_moyen
+            FROM stats_journalieres
+            WHERE {condition}
+            GROUP BY 1
+            ORDER BY 1
+        ''', params)
 
-        # Valeurs par défaut si pas de données
-        dossiers_semaine = 0
-        temps_moyen_semaine = 0
-        dossiers_mois = 0
-        temps_moyen_mois = 0
+    return granularite, evolution
 
-        if not stats_hebdo.empty:
-            dossiers_semaine = stats_hebdo.iloc[0]['dossiers_semaine'] or 0
-            temps_moyen_semaine = stats_hebdo.iloc[0]['temps_moyen_semaine'] or 0
 
-        if not stats_mensuel.empty:
-            dossiers_mois = stats_mensuel.iloc[0]['dossiers_mois'] or 0
-            temps_moyen_mois = stats_mensuel.iloc[0]['temps_moyen_mois'] or 0
+# Fonction pour générer l'analyse des statistiques
+def generer_analyse_statistiques():
+    # Tous les indicateurs proviennent d'un même calcul sur la table d'agrégats (copie DuckDB si configurée)
+    with get_db_connection() as conn:
+        metriques = calculer_metriques(get_moteur_statistiques() or conn)
+        total_dossiers = metriques.total_dossiers
+        objectif = metriques.objectif
+        perf_archivistes = metriques.archivistes
+        repartition_fonds = metriques.fonds
+        dossiers_semaine = metriques.dossiers_7j
+        temps_moyen_semaine = metriques.temps_moyen_7j
+        dossiers_mois = metriques.dossiers_30j
+        temps_moyen_mois = metriques.temps_moyen_30j
 
         # Génération de l'analyse textuelle
         analyse = f"""
@@ -442,7 +2602,7 @@ def generer_analyse_statistiques():
             recommandation = "ℹ️ Pas assez de données pour évaluer l'efficacité de saisie."
 
         # Projection
-        moyenne_jour = dossiers_semaine / 7 if dossiers_semaine > 0 else 0
+        moyenne_jour = metriques.rythme_7j
         projection_annuelle = int(moyenne_jour * 365)
 
         analyse += f"""
@@ -462,6 +2622,613 @@ l'équipe pourrait traiter {projection_annuelle:,} dossiers cette année."""
         return analyse
 
 
+# Rapport PDF des statistiques
+PDF_LIGNES_PAR_TABLEAU = 40
+PDF_RAPPORTS_EN_CACHE = 8
+
+PDF_STYLE_TABLEAU = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f2937')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f3f4f6')]),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+
+class FlowablesParLots(list):
+    """Liste de flowables alimentée à la demande par un générateur, pour borner la mémoire"""
+
+    def __init__(self, generateur, avance=20):
+        super().__init__()
+        self._generateur = generateur
+        self._avance = avance
+
+    def _remplir(self):
+        while self._generateur is not None and list.__len__(self) < self._avance:
+            try:
+                self.append(next(self._generateur))
+            except StopIteration:
+                self._generateur = None
+
+    def __len__(self):
+        self._remplir()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self._remplir()
+        return list.__getitem__(self, index)
+
+
+def _tableaux_par_lots(entete, lignes, largeurs):
+    """Découpe un flux de lignes en tableaux successifs de taille bornée"""
+    lot = []
+    for ligne in lignes:
+        lot.append(ligne)
+        if len(lot) == PDF_LIGNES_PAR_TABLEAU:
+            yield Table([entete] + lot, colWidths=largeurs, repeatRows=1, style=PDF_STYLE_TABLEAU)
+            lot = []
+    if lot:
+        yield Table([entete] + lot, colWidths=largeurs, repeatRows=1, style=PDF_STYLE_TABLEAU)
+
+
+def _contenu_rapport_pdf(conn, periode, objectif):
+    """Génère au fil de l'eau les flowables du rapport (KPI, archivistes, fonds)"""
+    styles = getSampleStyleSheet()
+    # Les lignes des tableaux viennent des agrégats en mémoire de l'instantané (une ligne par archiviste ou
+    # par fonds) ; seuls les flowables sont produits à la demande, par tableaux de PDF_LIGNES_PAR_TABLEAU lignes
+    metriques = calculer_metriques(conn, periode, objectif)
+
+    yield Paragraph("Centre National des Archives — Rapport statistique", styles['Title'])
+    yield Paragraph(f"Période : {periode} — généré le {datetime.now().strftime('%d/%m/%Y %H:%M')}",
+                    styles['Normal'])
+    yield Spacer(1, 0.3 * inch)
+
+    # Indicateurs clés
+    moyenne_jour = metriques.rythme_7j
+
+    yield Paragraph("Vue d'ensemble", styles['Heading2'])
+    yield Table([
+        ["Indicateur", "Valeur"],
+        ["Total des dossiers traités", f"{metriques.total_dossiers:,}"],
+        ["Objectif quotidien", f"{objectif} dossiers/jour"],
+        ["Dossiers (7 jours)", f"{metriques.dossiers_7j}"],
+        ["Temps moyen de saisie (7 jours)", f"{metriques.temps_moyen_7j:.1f} min"],
+        ["Dossiers (30 jours)", f"{metriques.dossiers_30j}"],
+        ["Temps moyen de saisie (30 jours)", f"{metriques.temps_moyen_30j:.1f} min"],
+        ["Projection annuelle", f"{int(moyenne_jour * 365):,} dossiers" if moyenne_jour else "N/A"],
+    ], colWidths=[3.2 * inch, 2.5 * inch], style=PDF_STYLE_TABLEAU)
+    yield Spacer(1, 0.3 * inch)
+
+    # Performance par archiviste (tableaux découpés par lots)
+    yield Paragraph("Performance des archivistes", styles['Heading2'])
+
+    def lignes_archivistes():
+        for ligne in metriques.archivistes.itertuples(index=False):
+            dossiers_7j = ligne.dossiers_7j
+            statut = "Excellent" if dossiers_7j >= objectif * 5 else "Bon" if dossiers_7j >= objectif * 3 else "À améliorer"
+            temps_moyen = ligne.temps_moyen if pd.notna(ligne.temps_moyen) else 0
+            yield [ligne.username, ligne.total_dossiers, dossiers_7j, f"{temps_moyen:.1f} min", statut]
+
+    yield from _tableaux_par_lots(
+        ["Archiviste", "Total", "7 jours", "Temps moyen", "Statut"], lignes_archivistes(),
+        [2 * inch, 1 * inch, 1 * inch, 1.2 * inch, 1.2 * inch]
+    )
+    yield Spacer(1, 0.3 * inch)
+
+    # Répartition par fonds (tableaux découpés par lots)
+    yield Paragraph("Répartition par fonds documentaires", styles['Heading2'])
+
+    def lignes_fonds():
+        for ligne in metriques.fonds.itertuples(index=False):
+            temps_moyen = ligne.temps_moyen if pd.notna(ligne.temps_moyen) else 0
+            yield [ligne.nom, ligne.count, f"{ligne.pourcentage:.1f}%", f"{temps_moyen:.1f} min"]
+
+    yield from _tableaux_par_lots(
+        ["Fonds", "Dossiers", "Part", "Temps moyen"], lignes_fonds(),
+        [2.8 * inch, 1 * inch, 1 * inch, 1.2 * inch]
+    )
+    yield Spacer(1, 0.3 * inch)
+
+    # Recommandation (mêmes seuils que l'analyse textuelle)
+    temps_moyen_mois = metriques.temps_moyen_30j
+    if temps_moyen_mois > 15:
+        recommandation = "Le temps de saisie moyen est élevé. Considérez une formation ou une simplification du processus."
+    elif temps_moyen_mois > 10:
+        recommandation = "Le temps de saisie est acceptable mais peut être optimisé."
+    elif temps_moyen_mois > 0:
+        recommandation = "Excellent temps de saisie ! L'équipe est très efficace."
+    else:
+        recommandation = "Pas assez de données pour évaluer l'efficacité de saisie."
+
+    yield Paragraph("Recommandations", styles['Heading2'])
+    yield Paragraph(recommandation, styles['Normal'])
+
+
+def export_pdf_stats(conn, periode="Toutes les données", objectif=10):
+    """Construit le rapport PDF des statistiques et retourne son contenu binaire"""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, title="Rapport statistique CNA",
+                            leftMargin=0.7 * inch, rightMargin=0.7 * inch)
+    doc.build(FlowablesParLots(_contenu_rapport_pdf(conn, periode, objectif)))
+    return buffer.getvalue()
+
+
+def version_donnees(conn):
+    """Empreinte peu coûteuse des données servant de clé de cache aux rapports"""
+    return conn.execute('''
+        SELECT
+            (SELECT IFNULL(MAX(id), 0) FROM dossiers),
+            (SELECT COUNT(*) || ':' || IFNULL(SUM(nb_dossiers), 0) || ':' || IFNULL(SUM(somme_temps), 0)
+             FROM stats_journalieres),
+            -- Change aussi quand une modification laisse les totaux inchangés (dossier réattribué)
+            (SELECT IFNULL(MAX(sequence), 0) FROM stats_journalieres_modifiees),
+            (SELECT COUNT(*) || ':' || IFNULL(MAX(id), 0) FROM users),
+            (SELECT COUNT(*) || ':' || IFNULL(MAX(id), 0) FROM fonds)
+    ''').fetchone()
+
+
+class GenerateurRapportsPDF:
+    """Rend les rapports PDF dans des threads dédiés et conserve les derniers rapports produits"""
+
+    def __init__(self, pool, max_rapports=PDF_RAPPORTS_EN_CACHE):
+        self._pool = pool
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rapport-pdf")
+        self._rapports = OrderedDict()
+        self._max_rapports = max_rapports
+        self._lock = threading.Lock()
+
+    def _rendre(self, periode, objectif):
+        with self._pool.connection() as conn:
+            return export_pdf_stats(conn, periode, objectif)
+
+    def demander(self, periode, objectif):
+        """Retourne le Future du rapport, en réutilisant un rendu identique déjà lancé ou terminé"""
+        with self._pool.connection() as conn:
+            cle = (periode, objectif, datetime.now().date().isoformat(), version_donnees(conn))
+
+        with self._lock:
+            future = self._rapports.get(cle)
+            if future is not None and not (future.done() and future.exception()):
+                self._rapports.move_to_end(cle)
+                return future
+
+            future = self._executor.submit(self._rendre, periode, objectif)
+            self._rapports[cle] = future
+
+            # Éviction des rapports les plus anciens déjà terminés
+            while len(self._rapports) > self._max_rapports:
+                plus_ancienne = next(iter(self._rapports))
+                if not self._rapports[plus_ancienne].done():
+                    break
+                self._rapports.pop(plus_ancienne)
+
+            return future
+
+
+@st.cache_resource
+def get_generateur_rapports():
+    return GenerateurRapportsPDF(get_connection_pool())
+
+
+# Écrivain unique des dossiers saisis (transactions groupées)
+ECRITURE_FENETRE_MS = float(os.environ.get("CNA_ECRITURE_FENETRE_MS", "20"))
+ECRITURE_LOT_MAX = int(os.environ.get("CNA_ECRITURE_LOT_MAX", "100"))
+ECRITURE_DELAI_REPONSE = 30
+
+INSERTION_DOSSIER_QUERY = '''
+    INSERT INTO dossiers (fonds_id, objet_id, analyse, mots_cles, date_debut, date_fin, archiviste_id, temps_saisie)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+class EcrivainDossiers:
+    """Thread propriétaire de la connexion d'écriture : regroupe les insertions des sessions par transaction"""
+
+    def __init__(self, pool, fenetre_ms=ECRITURE_FENETRE_MS, lot_max=ECRITURE_LOT_MAX):
+        self._pool = pool
+        self._fenetre = fenetre_ms / 1000
+        self._lot_max = lot_max
+        self._file = queue.Queue()
+        self.transactions = 0
+        self.dossiers = 0
+        self.erreurs = 0
+        self.redemarrages = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._boucle, name="ecrivain-dossiers", daemon=True)
+        self._thread.start()
+
+    def inserer(self, valeurs):
+        """Met un dossier en file ; le Future retourné donne l'identifiant créé ou l'erreur d'insertion"""
+        self._verifier_thread()
+        future = Future()
+        self._file.put((valeurs, future))
+        return future
+
+    def _verifier_thread(self):
+        # Un thread arrêté est relancé : sans lui, chaque saisie attendrait ECRITURE_DELAI_REPONSE pour rien
+        with self._lock:
+            if not self._thread.is_alive():
+                self.redemarrages += 1
+                self._thread = threading.Thread(target=self._boucle, name="ecrivain-dossiers", daemon=True)
+                self._thread.start()
+
+    def _lot_suivant(self):
+        """Attend une insertion puis accueille celles qui arrivent pendant la fenêtre de regroupement"""
+        lot = [self._file.get()]
+        echeance = time.monotonic() + self._fenetre
+        while len(lot) < self._lot_max:
+            restant = echeance - time.monotonic()
+            try:
+                lot.append(self._file.get(timeout=restant) if restant > 0 else self._file.get_nowait())
+            except queue.Empty:
+                break
+        return lot
+
+    def _boucle(self):
+        while True:
+            lot = [(valeurs, future) for valeurs, future in self._lot_suivant()
+                   if future.set_running_or_notify_cancel()]
+            if not lot:
+                continue
+            try:
+                # Connexion reprise au pool à chaque lot : une connexion en échec n'est pas réutilisée
+                # et les partitions d'archives ajoutées entre-temps sont attachées
+                with self._pool.connection() as conn:
+                    self._ecrire(conn, lot)
+            except Exception as e:
+                # Connexion impossible ou annulation en échec : seul ce lot échoue, la boucle continue
+                restants = [future for _, future in lot if not future.done()]
+                with self._lock:
+                    self.transactions += 1
+                    self.erreurs += len(restants)
+                for future in restants:
+                    future.set_exception(e)
+
+    def _ecrire(self, conn, lot):
+        resultats = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for valeurs, future in lot:
+                # Un point de sauvegarde par dossier : une insertion invalide n'annule pas les autres
+                conn.execute("SAVEPOINT dossier")
+                try:
+                    resultats.append((future, conn.execute(INSERTION_DOSSIER_QUERY, valeurs).lastrowid, None))
+                except sqlite3.Error as e:
+                    conn.execute("ROLLBACK TO dossier")
+                    resultats.append((future, None, e))
+                conn.execute("RELEASE dossier")
+            enregistres = [(dossier_id, valeurs) for (valeurs, _), (_, dossier_id, erreur)
+                           in zip(lot, resultats) if erreur is None]
+            indexer_mots_cles(conn, [(dossier_id, valeurs[3]) for dossier_id, valeurs in enregistres])
+            indexer_minhash(conn, [(dossier_id, *valeurs[:3]) for dossier_id, valeurs in enregistres])
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            resultats = [(future, None, e) for _, future in lot]
+
+        nb_erreurs = sum(erreur is not None for _, _, erreur in resultats)
+        with self._lock:
+            self.transactions += 1
+            self.dossiers += len(resultats) - nb_erreurs
+            self.erreurs += nb_erreurs
+
+        for future, dossier_id, erreur in resultats:
+            if erreur is None:
+                future.set_result(dossier_id)
+            else:
+                future.set_exception(erreur)
+
+    def statistiques(self):
+        with self._lock:
+            return {
+                "transactions": self.transactions,
+                "dossiers": self.dossiers,
+                "erreurs": self.erreurs,
+                "par_transaction": self.dossiers / self.transactions if self.transactions else 0,
+                "en_attente": self._file.qsize(),
+                "redemarrages": self.redemarrages,
+            }
+
+
+@st.cache_resource
+def get_ecrivain_dossiers():
+    return EcrivainDossiers(get_connection_pool())
+
+
+# Import en masse de dossiers (CSV / Excel)
+IMPORT_TAILLE_LOT = 5000
+IMPORT_COLONNES_OBLIGATOIRES = ("fonds", "objet", "analyse")
+IMPORT_COLONNES_OPTIONNELLES = ("mots_cles", "date_debut", "date_fin", "archiviste", "date_traitement", "temps_saisie")
+IMPORT_FORMATS_DATE = ("%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%d/%m/%Y", "%d/%m/%Y %H:%M:%S", "%d-%m-%Y", "%Y")
+
+
+def _lire_fichier_import(fichier, nom_fichier):
+    """Itère sur le fichier par lots de lignes (CSV décodé en entier avant le premier lot, Excel lu en une fois)"""
+    if nom_fichier.lower().endswith((".xlsx", ".xls")):
+        feuille = pd.read_excel(fichier, dtype=str)
+        for debut in range(0, len(feuille), IMPORT_TAILLE_LOT):
+            yield feuille.iloc[debut:debut + IMPORT_TAILLE_LOT]
+    else:
+        # Un octet invalide doit être signalé avant tout enregistrement, pas au milieu de l'import
+        donnees = fichier.read()
+        try:
+            texte = donnees.decode("utf-8-sig")
+        except UnicodeDecodeError as e:
+            ligne = donnees[:e.start].count(b"\n") + 1
+            raise ValueError(f"Le fichier n'est pas encodé en UTF-8 (ligne {ligne}) : aucun dossier importé") from e
+        if not texte.strip():
+            raise ValueError("Le fichier est vide : aucun dossier importé")
+        yield from pd.read_csv(io.StringIO(texte), dtype=str, sep=None, engine="python",
+                               chunksize=IMPORT_TAILLE_LOT)
+
+
+def _dates_import(colonne):
+    """Convertit une colonne de dates ; retourne les dates et le masque des valeurs non reconnues"""
+    textes = colonne.fillna("").astype(str).str.strip()
+    dates = pd.Series(pd.NaT, index=colonne.index, dtype="datetime64[ns]")
+    for format_date in IMPORT_FORMATS_DATE:
+        restantes = dates.isna() & (textes != "")
+        if not restantes.any():
+            break
+        dates[restantes] = pd.to_datetime(textes[restantes], format=format_date, errors="coerce")
+    return dates, (textes != "") & dates.isna()
+
+
+def _formater_dates_import(dates, format_sortie):
+    return dates.dt.strftime(format_sortie).where(dates.notna(), None)
+
+
+def _valider_lot_import(lot, fonds_ids, objets_ids, archivistes_ids, archiviste_defaut):
+    """Valide un lot de manière vectorisée ; retourne (lignes à insérer, lignes rejetées avec motif)"""
+    motifs = pd.Series("", index=lot.index)
+
+    def rejeter(masque, motif):
+        motifs[masque & (motifs == "")] = motif
+
+    analyse = lot["analyse"].fillna("").astype(str).str.strip()
+    rejeter(analyse == "", "analyse manquante")
+
+    fonds_id = lot["fonds"].fillna("").astype(str).str.strip().map(fonds_ids)
+    rejeter(fonds_id.isna(), "fonds inconnu")
+
+    objet_id = lot["objet"].fillna("").astype(str).str.strip().map(objets_ids)
+    rejeter(objet_id.isna(), "objet inconnu")
+
+    archivistes = lot["archiviste"].fillna("").astype(str).str.strip()
+    archiviste_id = archivistes.map(archivistes_ids)
+    rejeter((archivistes != "") & archiviste_id.isna(), "archiviste inconnu")
+    archiviste_id = archiviste_id.where(archivistes != "", archiviste_defaut)
+
+    date_debut, debut_invalide = _dates_import(lot["date_debut"])
+    date_fin, fin_invalide = _dates_import(lot["date_fin"])
+    rejeter(debut_invalide | fin_invalide, "date invalide")
+    rejeter(date_debut > date_fin, "date de début postérieure à la date de fin")
+
+    date_traitement, traitement_invalide = _dates_import(lot["date_traitement"])
+    rejeter(traitement_invalide, "date de traitement invalide")
+
+    temps_texte = lot["temps_saisie"].fillna("").astype(str).str.strip()
+    temps_saisie = pd.to_numeric(temps_texte.where(temps_texte != ""), errors="coerce")
+    rejeter((temps_texte != "") & ~((temps_saisie >= 0) & (temps_saisie % 1 == 0)), "temps de saisie invalide")
+
+    valides = motifs == ""
+    mots_cles = lot["mots_cles"].where(lot["mots_cles"].notna(), None)
+    lignes = list(zip(
+        fonds_id[valides].astype(int).tolist(),
+        objet_id[valides].astype(int).tolist(),
+        analyse[valides].tolist(),
+        mots_cles[valides].tolist(),
+        _formater_dates_import(date_debut[valides], "%Y-%m-%d").tolist(),
+        _formater_dates_import(date_fin[valides], "%Y-%m-%d").tolist(),
+        archiviste_id[valides].astype(int).tolist(),
+        _formater_dates_import(date_traitement[valides], "%Y-%m-%d %H:%M:%S").tolist(),
+        [int(t) if pd.notna(t) else None for t in temps_saisie[valides]],
+    ))
+
+    rejets = lot[~valides].copy()
+    rejets["motif_rejet"] = motifs[~valides]
+    return lignes, rejets
+
+
+def importer_dossiers(conn, fichier, nom_fichier, archiviste_defaut):
+    """Importe un fichier de dossiers par lots transactionnels.
+
+    Retourne (nb importés, DataFrame des rejets, message d'erreur ou None). Chaque lot est validé
+    puis enregistré dans sa propre transaction : une erreur de lecture en cours de fichier laisse
+    en base les lots déjà importés, que le message d'erreur dénombre.
+    """
+    fonds_ids = {nom: id_ for id_, nom in conn.execute("SELECT id, nom FROM fonds")}
+    objets_ids = {nom: id_ for id_, nom in conn.execute("SELECT id, nom FROM objets")}
+    archivistes_ids = {nom: id_ for id_, nom in conn.execute("SELECT id, username FROM users")}
+
+    nb_importes = 0
+    rejets = []
+    erreur = None
+    numero_ligne = 2  # ligne 1 = en-tête
+
+    lots = _lire_fichier_import(fichier, nom_fichier)
+    while True:
+        try:
+            lot = next(lots, None)
+        except (csv.Error, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+            erreur = (f"Lecture interrompue à partir de la ligne {numero_ligne} ({e}) : "
+                      f"{nb_importes} dossier(s) importé(s) avant l'erreur")
+            break
+        if lot is None:
+            break
+        lot = lot.rename(columns=lambda c: str(c).strip().lower())
+        manquantes = [c for c in IMPORT_COLONNES_OBLIGATOIRES if c not in lot.columns]
+        if manquantes:
+            raise ValueError(f"Colonnes obligatoires absentes : {', '.join(manquantes)}")
+        for colonne in IMPORT_COLONNES_OPTIONNELLES:
+            if colonne not in lot.columns:
+                lot[colonne] = None
+
+        lot.index = range(numero_ligne, numero_ligne + len(lot))
+        numero_ligne += len(lot)
+
+        lignes, rejets_lot = _valider_lot_import(lot, fonds_ids, objets_ids, archivistes_ids, archiviste_defaut)
+        if not rejets_lot.empty:
+            rejets.append(rejets_lot)
+
+        if lignes:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                dernier_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM main.dossiers").fetchone()[0]
+                conn.executemany('''
+                    INSERT INTO dossiers (fonds_id, objet_id, analyse, mots_cles, date_debut, date_fin,
+                                          archiviste_id, date_traitement, temps_saisie)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)
+                ''', lignes)
+                indexer_mots_cles(conn, conn.execute(
+                    "SELECT id, mots_cles FROM main.dossiers WHERE id > ? AND mots_cles IS NOT NULL", (dernier_id,)
+                ).fetchall())
+                indexer_minhash(conn, conn.execute(
+                    "SELECT id, fonds_id, objet_id, analyse FROM main.dossiers WHERE id > ?", (dernier_id,)
+                ).fetchall())
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            nb_importes += len(lignes)
+
+    rejets_df = pd.concat(rejets).rename_axis("ligne").reset_index() if rejets else pd.DataFrame()
+    return nb_importes, rejets_df, erreur
+
+
+# Archivage des dossiers anciens dans des partitions annuelles attachées
+ANNEES_CHAUDES = int(os.environ.get("CNA_ANNEES_CHAUDES", "1"))
+# Nombre maximal de bases attachées à une connexion SQLite (valeur par défaut de SQLITE_MAX_ATTACHED)
+PARTITIONS_MAX = 10
+
+
+def fichier_partition(db_path, annee):
+    """Nom du fichier d'archives d'une année, placé à côté de la base principale"""
+    return f"{os.path.splitext(os.path.basename(db_path))[0]}_{int(annee)}.db"
+
+
+def _creer_partition(conn, schema):
+    """Crée dans une partition attachée la table des dossiers, ses index et son index plein texte"""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {schema}.dossiers (
+            id INTEGER PRIMARY KEY,
+            fonds_id INTEGER,
+            objet_id INTEGER,
+            analyse TEXT,
+            mots_cles TEXT,
+            date_debut DATE,
+            date_fin DATE,
+            archiviste_id INTEGER,
+            date_traitement TIMESTAMP,
+            temps_saisie INTEGER,
+            jour_traitement TEXT GENERATED ALWAYS AS (DATE(date_traitement)) VIRTUAL
+        )
+    ''')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_dossiers_date_traitement ON dossiers (date_traitement)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {schema}.idx_dossiers_jour ON dossiers (jour_traitement, temps_saisie)')
+    conn.execute(f'''
+        CREATE INDEX IF NOT EXISTS {schema}.idx_dossiers_archiviste_jour
+        ON dossiers (archiviste_id, jour_traitement)
+    ''')
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.dossiers_fts USING fts5(
+            analyse,
+            mots_cles,
+            content='dossiers',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+
+
+def archiver_dossiers(pool, annee_limite):
+    """Déplace les dossiers traités avant `annee_limite` dans leurs partitions annuelles ; retourne {année: nb}"""
+    colonnes = ", ".join(c for c in COLONNES_TABLE_DOSSIERS if c != "jour_traitement")
+    deplaces = {}
+
+    with pool.connection() as conn:
+        annees = [int(ligne[0]) for ligne in conn.execute('''
+            SELECT DISTINCT substr(jour_traitement, 1, 4) FROM main.dossiers
+            WHERE jour_traitement < ?
+        ''', (f"{int(annee_limite):04d}-01-01",))]
+        if len(set(pool.partitions) | set(annees)) > PARTITIONS_MAX:
+            raise ValueError(f"Archivage impossible : au plus {PARTITIONS_MAX} partitions annuelles peuvent être "
+                             f"attachées à la base. Choisissez une année limite plus ancienne.")
+
+        attachees = {ligne[1] for ligne in conn.execute("PRAGMA database_list")}
+        for annee in annees:
+            schema = schema_partition(annee)
+            fichier = fichier_partition(pool.db_path, annee)
+            if schema not in attachees:
+                chemin = os.path.join(os.path.dirname(os.path.abspath(pool.db_path)), fichier)
+                conn.execute(f"ATTACH DATABASE ? AS {schema}", (chemin,))
+            conn.execute(f"PRAGMA {schema}.journal_mode = WAL")
+            _creer_partition(conn, schema)
+            periode = (f"{annee:04d}-01-01", f"{annee + 1:04d}-01-01")
+
+            # 1. Copie dans la partition (idempotente) : en cas d'interruption, les lignes restent dans la base courante
+            conn.execute("BEGIN")
+            try:
+                conn.execute(f'''
+                    INSERT OR IGNORE INTO {schema}.dossiers ({colonnes})
+                    SELECT {colonnes} FROM main.dossiers
+                    WHERE jour_traitement >= ? AND jour_traitement < ?
+                ''', periode)
+                conn.execute(f"INSERT INTO {schema}.dossiers_fts (dossiers_fts) VALUES ('rebuild')")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            conn.execute(f"ANALYZE {schema}")
+
+            # 2. Retrait de la base courante des lignes copiées et enregistrement de la partition
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                predicat = f"jour_traitement >= ? AND jour_traitement < ? AND id IN (SELECT id FROM {schema}.dossiers)"
+                # Les agrégats couvrent tout l'historique : ceux retirés par le trigger de suppression sont rétablis
+                conn.execute(f'''
+                    CREATE TEMP TABLE stats_archivees AS
+                    SELECT jour_traitement as jour, IFNULL(archiviste_id, 0) as archiviste_id,
+                           IFNULL(fonds_id, 0) as fonds_id, IFNULL(objet_id, 0) as objet_id,
+                           COUNT(*) as nb_dossiers, IFNULL(SUM(temps_saisie), 0) as somme_temps,
+                           COUNT(temps_saisie) as nb_temps
+                    FROM main.dossiers
+                    WHERE {predicat}
+                    GROUP BY 1, 2, 3, 4
+                ''', periode)
+                nb = conn.execute(f"DELETE FROM main.dossiers WHERE {predicat}", periode).rowcount
+                conn.execute('''
+                    INSERT INTO main.stats_journalieres
+                        (jour, archiviste_id, fonds_id, objet_id, nb_dossiers, somme_temps, nb_temps)
+                    SELECT * FROM temp.stats_archivees WHERE 1
+                    ON CONFLICT (jour, archiviste_id, fonds_id, objet_id) DO UPDATE SET
+                        nb_dossiers = nb_dossiers + excluded.nb_dossiers,
+                        somme_temps = somme_temps + excluded.somme_temps,
+                        nb_temps = nb_temps + excluded.nb_temps
+                ''')
+                conn.execute("DROP TABLE temp.stats_archivees")
+                conn.execute(f'''
+                    INSERT INTO partitions_dossiers (annee, fichier, nb_dossiers)
+                    VALUES (?, ?, (SELECT COUNT(*) FROM {schema}.dossiers))
+                    ON CONFLICT (annee) DO UPDATE SET
+                        nb_dossiers = excluded.nb_dossiers,
+                        archive_le = CURRENT_TIMESTAMP
+                ''', (annee, fichier))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            deplaces[annee] = nb
+
+        pool.recharger_partitions(conn)
+
+    return deplaces
+
+
 # Page de connexion
 def login_page():
     display_header("Centre National des Archives", "Système de gestion et traitement des dossiers d'archives")
@@ -489,79 +3256,135 @@ def login_page():
         st.warning("⚠️ **Sécurité :** Pensez à changer votre mot de passe après votre première connexion.")
 
 
-# Page tableau de bord
-def dashboard_page():
-    display_header("📊 Tableau de Bord", "Centre National des Archives - Vue d'ensemble")
+# Tableau de bord rafraîchi par fragments, compteurs tenus à jour par identifiant croissant
+TABLEAU_DE_BORD_RAFRAICHISSEMENT = int(os.environ.get("CNA_TABLEAU_DE_BORD_RAFRAICHISSEMENT", "30"))
+TABLEAU_DE_BORD_RESYNCHRO = 900
+
+
+def _etat_tableau_de_bord(conn, etat=None):
+    """Compteurs du tableau de bord : `etat` précédent complété par les seuls dossiers saisis depuis sa lecture"""
+    aujourd_hui = datetime.now().date().isoformat()
+
+    # Recalcul complet à l'ouverture, au changement de jour et périodiquement (archivages, reconstructions)
+    if etat is None or etat['jour'] != aujourd_hui or time.monotonic() >= etat['resynchro']:
+        with LecteurSQLite(conn).instantane():
+            metriques = calculer_metriques(conn)
+            dernier_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM main.dossiers").fetchone()[0]
+        etat = {
+            'jour': aujourd_hui,
+            'debut_7j': bornes_periode("7 derniers jours")[0].isoformat(),
+            'resynchro': time.monotonic() + TABLEAU_DE_BORD_RESYNCHRO,
+            'dernier_id': dernier_id,
+            'total': metriques.total_dossiers,
+            'par_jour': dict(zip(metriques.evolution_7j['date'], metriques.evolution_7j['count'].astype(int))),
+            'fonds': dict(zip(metriques.fonds['nom'], metriques.fonds['count'].astype(int))),
+        }
+        return etat
+
+    # Sinon, seuls les dossiers d'identifiant supérieur au dernier vu sont lus (parcours de la clé primaire)
+    nouveaux = conn.execute('''
+        SELECT d.jour_traitement, f.nom, COUNT(*), MAX(d.id) FROM main.dossiers d
+        LEFT JOIN fonds f ON f.id = d.fonds_id
+        WHERE d.id > ?
+        GROUP BY d.jour_traitement, d.fonds_id
+    ''', (etat['dernier_id'],)).fetchall()
+    for jour, fonds, nb, dernier_id in nouveaux:
+        etat['total'] += nb
+        if jour >= etat['debut_7j']:
+            etat['par_jour'][jour] = etat['par_jour'].get(jour, 0) + nb
+        if fonds is not None:
+            etat['fonds'][fonds] = etat['fonds'].get(fonds, 0) + nb
+        etat['dernier_id'] = max(etat['dernier_id'], dernier_id)
+    return etat
+
+
+def _indicateurs_tableau_de_bord(etat):
+    dossiers_aujourd_hui = etat['par_jour'].get(etat['jour'], 0)
+    objectif = get_objectif_quotidien()
+    taux_objectif = dossiers_aujourd_hui / objectif * 100 if objectif > 0 else 0
+
+    # Affichage des métriques
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.metric("Total dossiers", etat['total'])
+
+    with col2:
+        st.metric("Dossiers aujourd'hui", dossiers_aujourd_hui)
+
+    with col3:
+        st.metric("Objectif quotidien", objectif)
+
+    with col4:
+        st.metric("Taux d'objectif", f"{taux_objectif:.1f}%")
+
+
+def _evolution_tableau_de_bord(etat):
+    st.markdown("### 📈 Évolution des saisies (7 derniers jours)")
+
+    week_data = pd.DataFrame(sorted(etat['par_jour'].items()), columns=['date', 'count'])
 
-    # Métriques principales
+    if not week_data.empty:
+        with mesure_phase("graphiques"):
+            fig = px.line(week_data, x='date', y='count', markers=True)
+            fig.update_layout(height=400)
+            st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("Aucune donnée disponible pour les 7 derniers jours")
+
+
+def _repartition_fonds_tableau_de_bord(etat):
+    st.markdown("### 📊 Répartition par fonds")
+
+    fonds_data = pd.DataFrame([(nom, nb) for nom, nb in etat['fonds'].items() if nb > 0], columns=['nom', 'count'])
+
+    if not fonds_data.empty:
+        with mesure_phase("graphiques"):
+            fig = px.pie(fonds_data, values='count', names='nom')
+            fig.update_layout(height=400)
+            st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("Aucune donnée disponible")
+
+
+# Métriques et graphiques dans un même fragment : un seul calcul des compteurs par exécution,
+# qu'elle vienne de la page entière ou du rafraîchissement périodique
+@st.fragment(run_every=TABLEAU_DE_BORD_RAFRAICHISSEMENT)
+def _tableau_de_bord():
     with get_db_connection() as conn:
-        # Statistiques générales
-        total_dossiers = pd.read_sql_query('SELECT COUNT(*) as count FROM dossiers', conn).iloc[0]['count']
+        etat = _etat_tableau_de_bord(conn, st.session_state.get('tableau_de_bord'))
+    st.session_state.tableau_de_bord = etat
 
-        today = datetime.now().date()
-        dossiers_aujourd_hui = pd.read_sql_query(
-            'SELECT COUNT(*) as count FROM dossiers WHERE DATE(date_traitement) = ?',
-            conn, params=[today]
-        ).iloc[0]['count']
+    _indicateurs_tableau_de_bord(etat)
 
-        # Objectif quotidien
-        objectif = get_objectif_quotidien()
-        taux_objectif = (dossiers_aujourd_hui / objectif * 100) if objectif > 0 else 0
+    # Graphiques
+    col1, col2 = st.columns(2)
 
-        # Affichage des métriques
-        col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        _evolution_tableau_de_bord(etat)
 
-        with col1:
-            st.metric("Total dossiers", total_dossiers)
+    with col2:
+        _repartition_fonds_tableau_de_bord(etat)
 
-        with col2:
-            st.metric("Dossiers aujourd'hui", dossiers_aujourd_hui)
+    st.caption(f"Actualisé à {datetime.now().strftime('%H:%M:%S')}, "
+               f"toutes les {TABLEAU_DE_BORD_RAFRAICHISSEMENT} s")
 
-        with col3:
-            st.metric("Objectif quotidien", objectif)
 
-        with col4:
-            st.metric("Taux d'objectif", f"{taux_objectif:.1f}%")
+# Page tableau de bord
+def dashboard_page():
+    display_header("📊 Tableau de Bord", "Centre National des Archives - Vue d'ensemble")
 
-        # Graphiques
-        col1, col2 = st.columns(2)
+    # Fragment rafraîchi seul, sans réexécuter la page
+    _tableau_de_bord()
 
-        with col1:
-            st.markdown("### 📈 Évolution des saisies (7 derniers jours)")
-
-            # Données des 7 derniers jours
-            week_data = pd.read_sql_query('''
-                SELECT DATE(date_traitement) as date, COUNT(*) as count
-                FROM dossiers
-                WHERE date_traitement >= date('now', '-7 days')
-                GROUP BY DATE(date_traitement)
-                ORDER BY date
-            ''', conn)
-
-            if not week_data.empty:
-                fig = px.line(week_data, x='date', y='count', markers=True)
-                fig.update_layout(height=400)
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("Aucune donnée disponible pour les 7 derniers jours")
 
-        with col2:
-            st.markdown("### 📊 Répartition par fonds")
-
-            fonds_data = pd.read_sql_query('''
-                SELECT f.nom, COUNT(d.id) as count
-                FROM fonds f
-                LEFT JOIN dossiers d ON f.id = d.fonds_id
-                GROUP BY f.id, f.nom
-                ORDER BY count DESC
-            ''', conn)
-
-            if not fonds_data.empty and fonds_data['count'].sum() > 0:
-                fig = px.pie(fonds_data[fonds_data['count'] > 0], values='count', names='nom')
-                fig.update_layout(height=400)
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("Aucune donnée disponible")
+def _ajouter_mot_cle_saisie(libelle):
+    """Ajoute une suggestion aux mots-clés du formulaire de saisie, sans doublon"""
+    saisis = st.session_state.get("saisie_mots_cles", "")
+    if normaliser_mot_cle(libelle) not in extraire_mots_cles(saisis):
+        saisis = saisis.rstrip(" ,;\n")
+        st.session_state["saisie_mots_cles"] = f"{saisis}, {libelle}" if saisis else libelle
+    st.session_state["saisie_prefixe_mot_cle"] = ""
 
 
 # Page de saisie de dossier
@@ -572,6 +3395,20 @@ def saisie_dossier_page():
     if 'debut_saisie' not in st.session_state:
         st.session_state.debut_saisie = datetime.now()
 
+    # Autocomplétion des mots-clés existants, servie par l'index en mémoire (aucune requête par frappe)
+    prefixe = st.text_input("🏷️ Chercher un mot-clé existant", key="saisie_prefixe_mot_cle",
+                            placeholder="Début d'un mot-clé, puis Entrée")
+    suggestions = get_index_mots_cles().suggerer(prefixe) if prefixe else []
+    if suggestions:
+        for colonne, (libelle, nb) in zip(st.columns(len(suggestions)), suggestions):
+            colonne.button(f"{libelle} ({nb})", key=f"suggestion_{normaliser_mot_cle(libelle)}",
+                           on_click=_ajouter_mot_cle_saisie, args=(libelle,))
+    elif len(normaliser_mot_cle(prefixe)) < AUTOCOMPLETION_PREFIXE_MIN:
+        if prefixe:
+            st.caption(f"Saisissez au moins {AUTOCOMPLETION_PREFIXE_MIN} caractères.")
+    else:
+        st.caption("Aucun mot-clé existant ne commence ainsi.")
+
     with st.form("saisie_dossier"):
         col1, col2 = st.columns(2)
 
@@ -604,7 +3441,7 @@ def saisie_dossier_page():
                                    placeholder="Décrivez le contenu du dossier...")
 
             # Mots-clés
-            mots_cles = st.text_area("Mots-clés (séparés par des virgules)", height=80,
+            mots_cles = st.text_area("Mots-clés (séparés par des virgules)", height=80, key="saisie_mots_cles",
                                      placeholder="mot1, mot2, mot3...")
 
         submitted = st.form_submit_button("💾 Enregistrer le dossier", use_container_width=True)
@@ -615,16 +3452,31 @@ def saisie_dossier_page():
             elif date_debut > date_fin:
                 st.error("La date de début ne peut pas être postérieure à la date de fin")
             else:
-                # Calculer le temps de saisie
-                temps_saisie = int((datetime.now() - st.session_state.debut_saisie).total_seconds() / 60)
-
-                # Insérer en base
+                # Quasi-doublons du même fonds et objet : soumettre à nouveau la même saisie confirme l'enregistrement
+                saisie = (fonds_options[fonds_selected], objets_options[objet_selected], normaliser_mot_cle(analyse))
                 with get_db_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        INSERT INTO dossiers (fonds_id, objet_id, analyse, mots_cles, date_debut, date_fin, archiviste_id, temps_saisie)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
+                    doublons = quasi_doublons(conn, saisie[0], saisie[1], analyse)
+
+                if not doublons.empty and st.session_state.get('doublons_confirmes') != saisie:
+                    st.session_state.doublons_confirmes = saisie
+                    st.warning(f"⚠️ {len(doublons)} dossier(s) de ce fonds et de cet objet ont une analyse quasi "
+                               "identique. Vérifiez qu'il ne s'agit pas du même dossier, puis enregistrez à nouveau "
+                               "pour confirmer la saisie.")
+                    doublons['similarite'] = (doublons['similarite'] * 100).round().astype(int).astype(str) + " %"
+                    st.dataframe(doublons[['id', 'analyse', 'archiviste', 'date_traitement', 'similarite']].rename(
+                        columns={
+                            'id': 'N°',
+                            'analyse': 'Analyse',
+                            'archiviste': 'Archiviste',
+                            'date_traitement': 'Saisi le',
+                            'similarite': 'Similarité'
+                        }), use_container_width=True, hide_index=True)
+                else:
+                    # Calculer le temps de saisie
+                    temps_saisie = int((datetime.now() - st.session_state.debut_saisie).total_seconds() / 60)
+
+                    # Insertion confiée à l'écrivain unique, qui regroupe les saisies concurrentes en une transaction
+                    future = get_ecrivain_dossiers().inserer((
                         fonds_options[fonds_selected],
                         objets_options[objet_selected],
                         analyse,
@@ -634,12 +3486,24 @@ def saisie_dossier_page():
                         st.session_state.user['id'],
                         temps_saisie
                     ))
-                    conn.commit()
 
-                st.success(f"✅ Dossier enregistré avec succès ! (Temps de saisie: {temps_saisie} minutes)")
+                    try:
+                        dossier_id = future.result(timeout=ECRITURE_DELAI_REPONSE)
+                    except FutureTimeoutError:
+                        st.error("L'enregistrement n'a pas été confirmé à temps. Vérifiez le tableau des saisies "
+                                 "avant de saisir à nouveau ce dossier.")
+                    except Exception as e:
+                        # L'écrivain transmet toute erreur du lot, y compris celles de l'indexation
+                        st.error(f"Erreur lors de l'enregistrement du dossier : {str(e)}")
+                    else:
+                        st.success(f"✅ Dossier n°{dossier_id} enregistré avec succès ! "
+                                   f"(Temps de saisie: {temps_saisie} minutes)")
+                        # L'index de préfixes sert aussi le filtre de la recherche : les nouveaux mots-clés y sont proposés
+                        get_index_mots_cles().ajouter(mots_cles)
 
-                # Réinitialiser le temps de début
-                st.session_state.debut_saisie = datetime.now()
+                        # Réinitialiser le temps de début
+                        st.session_state.debut_saisie = datetime.now()
+                        st.session_state.pop('doublons_confirmes', None)
 
 
 # Page de recherche
@@ -647,126 +3511,123 @@ def recherche_page():
     display_header("🔍 Recherche de Dossiers", "Centre National des Archives - Moteur de recherche")
 
     # Filtres de recherche
-    with st.expander("🔧 Filtres de recherche", expanded=True):
+    zone_filtres = st.expander("🔧 Filtres de recherche", expanded=True)
+    with zone_filtres:
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            mot_cle = st.text_input("Mot-clé")
-
-            fonds_df = get_fonds()
-            fonds_filter = st.multiselect("Fonds", options=fonds_df['nom'].tolist() if not fonds_df.empty else [])
+            mot_cle = st.text_input("Mot-clé", help='Recherche insensible aux accents. Exemples : archiv*, '
+                                                   '"acte de naissance", contrat AND NOT facture')
 
         with col2:
             date_debut_filter = st.date_input("Date début (après)", value=None)
             date_fin_filter = st.date_input("Date fin (avant)", value=None)
 
         with col3:
-            objets_df = get_objets()
-            objets_filter = st.multiselect("Objets", options=objets_df['nom'].tolist() if not objets_df.empty else [])
-
-            archivistes_df = get_archivistes()
-            archivistes_filter = st.multiselect("Archivistes", options=archivistes_df[
-                'username'].tolist() if not archivistes_df.empty else [])
-
-    # Construction de la requête
-    with get_db_connection() as conn:
-        query = '''
-            SELECT 
-                d.id,
-                f.nom as fonds,
-                o.nom as objet,
-                d.analyse,
-                d.mots_cles,
-                d.date_debut,
-                d.date_fin,
-                u.username as archiviste,
-                d.date_traitement,
-                d.temps_saisie
-            FROM dossiers d
-            JOIN fonds f ON d.fonds_id = f.id
-            JOIN objets o ON d.objet_id = o.id
-            JOIN users u ON d.archiviste_id = u.id
-            WHERE 1=1
-        '''
-        params = []
-
-        # Appliquer les filtres
-        if mot_cle:
-            query += " AND (d.analyse LIKE ? OR d.mots_cles LIKE ?)"
-            params.extend([f"%{mot_cle}%", f"%{mot_cle}%"])
-
-        if fonds_filter:
-            placeholders = ",".join(["?" for _ in fonds_filter])
-            query += f" AND f.nom IN ({placeholders})"
-            params.extend(fonds_filter)
+            # Mots-clés exacts (normalisés), résolus par l'index inversé. Les options se limitent aux
+            # suggestions de l'index de préfixes et aux mots-clés déjà retenus, quel que soit le dictionnaire
+            prefixe_mot_cle = st.text_input("Mots-clés exacts : début du mot-clé", key="recherche_prefixe_mot_cle",
+                                            placeholder=f"Au moins {AUTOCOMPLETION_PREFIXE_MIN} caractères")
+            suggestions = get_index_mots_cles().suggerer(prefixe_mot_cle, limite=RECHERCHE_MOTS_CLES_SUGGESTIONS)
+            mots_cles_options = list(dict.fromkeys(
+                st.session_state.get("recherche_mots_cles", []) + [libelle for libelle, _ in suggestions]
+            ))
+            mots_cles_filter = st.multiselect("Mots-clés exacts (tous requis)", options=mots_cles_options,
+                                              key="recherche_mots_cles")
 
-        if objets_filter:
-            placeholders = ",".join(["?" for _ in objets_filter])
-            query += f" AND o.nom IN ({placeholders})"
-            params.extend(objets_filter)
-
-        if archivistes_filter:
-            placeholders = ",".join(["?" for _ in archivistes_filter])
-            query += f" AND u.username IN ({placeholders})"
-            params.extend(archivistes_filter)
+    try:
+        requete_fts = construire_requete_fts(mot_cle) if mot_cle else ""
+    except ValueError:
+        st.error(MESSAGE_REQUETE_FTS_INVALIDE)
+        return
+    if mots_cles_filter:
+        with get_db_connection() as conn:
+            mots_cles_ids = ids_mots_cles(conn, mots_cles_filter)
+    else:
+        mots_cles_ids = []
 
-        if date_debut_filter:
-            query += " AND d.date_debut >= ?"
-            params.append(date_debut_filter)
+    with zone_filtres:
+        fonds_df = get_fonds()
+        objets_df = get_objets()
+        archivistes_df = get_archivistes()
+        # Options fixes (données de référence) : l'identité des widgets et les sélections ne dépendent pas de la requête
+        options_facettes = {
+            "fonds": ("Fonds", fonds_df['nom'].tolist() if not fonds_df.empty else []),
+            "objet": ("Objets", objets_df['nom'].tolist() if not objets_df.empty else []),
+            "archiviste": ("Archivistes", archivistes_df['username'].tolist() if not archivistes_df.empty else []),
+            "annee": ("Années (date de début)", get_annees()),
+        }
 
-        if date_fin_filter:
-            query += " AND d.date_fin <= ?"
-            params.append(date_fin_filter)
+        colonnes_facettes = dict(zip(FACETTES_RECHERCHE, st.columns(len(FACETTES_RECHERCHE))))
+        selections = {}
+        for nom, (libelle, options) in options_facettes.items():
+            with colonnes_facettes[nom]:
+                selections[nom] = st.multiselect(libelle, options=options, key=f"facette_{nom}")
+
+        # Comptes de chaque facette, les sélections des autres facettes appliquées
+        try:
+            with get_db_connection() as conn:
+                comptes, total_resultats = compter_facettes_recherche(
+                    conn, requete_fts, date_debut_filter, date_fin_filter, mots_cles_ids, selections
+                )
+        except sqlite3.OperationalError:
+            st.error(MESSAGE_REQUETE_FTS_INVALIDE)
+            return
 
-        query += " ORDER BY d.date_traitement DESC"
+        for nom, compte in comptes.items():
+            with colonnes_facettes[nom]:
+                if not compte.empty:
+                    st.caption(" · ".join(f"{valeur} ({nb})" for valeur, nb in
+                                          compte.head(FACETTES_VALEURS_AFFICHEES).items()))
 
-        # Exécuter la recherche
-        resultats = pd.read_sql_query(query, conn, params=params)
+    # Construction de la requête
+    source, filtres, params, tri = requete_recherche(
+        requete_fts, selections["fonds"], selections["objet"], selections["archiviste"],
+        date_debut_filter, date_fin_filter, mots_cles_ids, selections["annee"]
+    )
+    colonnes = COLONNES_RECHERCHE
+    # Recherche plein texte : extraits surlignés et tri par pertinence (bm25)
+    colonnes_page = colonnes + COLONNES_EXTRAITS_FTS if requete_fts else colonnes
 
     # Afficher les résultats
-    st.markdown(f"### 📋 Résultats ({len(resultats)} dossier(s) trouvé(s))")
+    st.markdown(f"### 📋 Résultats ({total_resultats} dossier(s) trouvé(s))")
 
-    if not resultats.empty:
+    if total_resultats:
         # Options d'affichage
         col1, col2 = st.columns([3, 1])
+        with col1:
+            items_per_page = st.selectbox("Résultats par page", RECHERCHE_TAILLES_PAGE, index=1)
         with col2:
             if st.button("📥 Exporter CSV"):
-                csv = resultats.to_csv(index=False)
-                st.download_button(
-                    label="Télécharger CSV",
-                    data=csv,
-                    file_name=f"recherche_archives_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv"
-                )
-
-        # Affichage paginé
-        items_per_page = 10
-        total_pages = (len(resultats) - 1) // items_per_page + 1
+                with get_db_connection() as conn, exporter_csv(
+                    conn, f"SELECT {colonnes} FROM {source} WHERE {filtres} ORDER BY {tri[0]} {tri[1]}, d.id", params
+                ) as fichier:
+                    st.download_button(
+                        label="Télécharger CSV",
+                        data=fichier.read(),
+                        file_name=f"recherche_archives_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                        mime="text/csv"
+                    )
+
+        # Affichage paginé côté serveur
+        total_pages = (total_resultats - 1) // items_per_page + 1
 
         if total_pages > 1:
             page = st.selectbox("Page", options=range(1, total_pages + 1))
-            start_idx = (page - 1) * items_per_page
-            end_idx = start_idx + items_per_page
-            resultats_page = resultats.iloc[start_idx:end_idx]
         else:
-            resultats_page = resultats
-
-        # Affichage des résultats sous forme de cartes
-        for _, row in resultats_page.iterrows():
-            with st.container():
-                st.markdown(f"""
-                <div style="border: 1px solid #ddd; border-radius: 8px; padding: 1rem; margin: 1rem 0; background: white;">
-                    <h4>📁 {row['fonds']} - {row['objet']}</h4>
-                    <p><strong>Analyse:</strong> {row['analyse']}</p>
-                    <p><strong>Mots-clés:</strong> {row['mots_cles'] if row['mots_cles'] else 'Aucun'}</p>
-                    <div style="display: flex; gap: 2rem; font-size: 0.9em; color: #666;">
-                        <span>📅 {row['date_debut']} - {row['date_fin']}</span>
-                        <span>👤 {row['archiviste']}</span>
-                        <span>🕒 {row['date_traitement']}</span>
-                        <span>⏱️ {row['temps_saisie']} min</span>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+            page = 1
+
+        # Le score bm25 n'est pas utilisable comme curseur : la recherche plein texte pagine par OFFSET
+        curseurs = None if requete_fts else curseurs_pagination(
+            'curseurs_recherche', (source, filtres, tuple(map(str, params)), items_per_page)
+        )
+        with get_db_connection() as conn:
+            resultats_page = lire_page(conn, colonnes_page, source, filtres, params, tri,
+                                       page, items_per_page, curseurs)
+
+        # Affichage des résultats : toutes les cartes de la page en un seul élément
+        with mesure_phase("affichage"):
+            st.markdown(rendre_cartes_resultats(resultats_page, bool(requete_fts)), unsafe_allow_html=True)
     else:
         st.info("Aucun dossier ne correspond aux critères de recherche")
 
@@ -812,80 +3673,39 @@ def tableau_saisies_page():
         with col2:
             date_fin_custom = st.date_input("Date de fin")
 
-    # Construction de la requête
+    # Construction des filtres (communs au comptage, aux statistiques et à la page affichée)
+    if periode_filter == "Période personnalisée":
+        bornes = bornes_periode(periode_filter, date_debut_custom, date_fin_custom)
+    else:
+        bornes = bornes_periode(periode_filter)
+
+    # Seules les partitions d'archives qui recoupent la période sont interrogées
+    fonds_choisi = None if fonds_filter == "Tous" else fonds_filter
+    if st.session_state.user['role'] != 'administrateur':
+        source, filtres, params = requete_saisies(bornes, archiviste_id=st.session_state.user['id'],
+                                                  fonds=fonds_choisi)
+    else:
+        archiviste_choisi = None if archiviste_filter == "Tous" else archiviste_filter
+        source, filtres, params = requete_saisies(bornes, archiviste=archiviste_choisi, fonds=fonds_choisi)
+    colonnes = COLONNES_SAISIES
+
+    # Comptage et statistiques rapides calculés en base, sans charger les lignes
     with get_db_connection() as conn:
-        query = '''
-            SELECT 
-                d.id,
-                f.nom as fonds,
-                o.nom as objet,
-                d.analyse,
-                d.mots_cles,
-                d.date_debut,
-                d.date_fin,
-                u.username as archiviste,
-                DATE(d.date_traitement) as date_saisie,
-                TIME(d.date_traitement) as heure_saisie,
-                d.temps_saisie
-            FROM dossiers d
-            JOIN fonds f ON d.fonds_id = f.id
-            JOIN objets o ON d.objet_id = o.id
-            JOIN users u ON d.archiviste_id = u.id
-            WHERE 1=1
-        '''
-        params = []
+        resume = resume_saisies(conn, source, filtres, params)
 
-        # Filtres de période
-        if periode_filter == "Aujourd'hui":
-            query += " AND DATE(d.date_traitement) = date('now')"
-        elif periode_filter == "Cette semaine":
-            query += " AND d.date_traitement >= date('now', '-7 days')"
-        elif periode_filter == "Ce mois":
-            query += " AND d.date_traitement >= date('now', '-30 days')"
-        elif periode_filter == "Période personnalisée":
-            query += " AND DATE(d.date_traitement) BETWEEN ? AND ?"
-            params.extend([date_debut_custom, date_fin_custom])
-
-        # Filtre archiviste
-        if st.session_state.user['role'] != 'administrateur':
-            query += " AND d.archiviste_id = ?"
-            params.append(st.session_state.user['id'])
-        elif archiviste_filter != "Tous":
-            query += " AND u.username = ?"
-            params.append(archiviste_filter)
-
-        # Filtre fonds
-        if fonds_filter != "Tous":
-            query += " AND f.nom = ?"
-            params.append(fonds_filter)
-
-        # Tri
-        if tri_filter == "Date (récent)":
-            query += " ORDER BY d.date_traitement DESC"
-        elif tri_filter == "Date (ancien)":
-            query += " ORDER BY d.date_traitement ASC"
-        elif tri_filter == "Temps de saisie":
-            query += " ORDER BY d.temps_saisie DESC"
-        elif tri_filter == "Alphabétique":
-            query += " ORDER BY d.analyse ASC"
-
-        # Exécuter la requête
-        saisies_df = pd.read_sql_query(query, conn, params=params)
+    total_saisies, temps_moyen, temps_total, fonds_uniques = resume
 
     # Statistiques rapides
-    if not saisies_df.empty:
+    if total_saisies:
         col1, col2, col3, col4 = st.columns(4)
 
         with col1:
-            st.metric("Total saisies", len(saisies_df))
+            st.metric("Total saisies", total_saisies)
         with col2:
-            temps_moyen = saisies_df['temps_saisie'].mean()
-            st.metric("Temps moyen", f"{temps_moyen:.1f} min")
+            st.metric("Temps moyen", f"{temps_moyen or 0:.1f} min")
         with col3:
-            temps_total = saisies_df['temps_saisie'].sum()
-            st.metric("Temps total", f"{temps_total:.0f} min")
+            st.metric("Temps total", f"{temps_total or 0:.0f} min")
         with col4:
-            fonds_uniques = saisies_df['fonds'].nunique()
             st.metric("Fonds différents", fonds_uniques)
 
     # Boutons d'action
@@ -893,26 +3713,61 @@ def tableau_saisies_page():
 
     with col2:
         if st.button("📊 Analyser", use_container_width=True):
-            if not saisies_df.empty:
+            if total_saisies:
                 st.session_state.show_analysis = True
             else:
                 st.warning("Aucune donnée à analyser")
 
     with col3:
-        if not saisies_df.empty:
-            # Export CSV
-            csv = saisies_df.to_csv(index=False)
-            st.download_button(
-                label="📥 Export CSV",
-                data=csv,
-                file_name=f"saisies_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv",
-                use_container_width=True
-            )
+        if total_saisies and st.button("📥 Export CSV", use_container_width=True):
+            # Export CSV (le jeu complet n'est lu qu'à la demande, par lots)
+            with get_db_connection() as conn, exporter_csv(
+                conn, f"SELECT {colonnes} FROM {source} WHERE {filtres} ORDER BY d.date_traitement DESC", params
+            ) as fichier:
+                st.download_button(
+                    label="Télécharger CSV",
+                    data=fichier.read(),
+                    file_name=f"saisies_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv",
+                    use_container_width=True
+                )
 
     # Affichage de l'analyse si demandée
-    if hasattr(st.session_state, 'show_analysis') and st.session_state.show_analysis and not saisies_df.empty:
+    if hasattr(st.session_state, 'show_analysis') and st.session_state.show_analysis and total_saisies:
         with st.expander("📈 Analyse détaillée", expanded=True):
+            with get_db_connection() as conn:
+                fonds_stats = conn.execute(f'''
+                    SELECT f.nom, COUNT(*) as count
+                    FROM {source}
+                    WHERE {filtres}
+                    GROUP BY f.id, f.nom
+                    ORDER BY count DESC
+                ''', params).fetchall()
+
+                temps_min, temps_max, nb_temps = conn.execute(f'''
+                    SELECT MIN(d.temps_saisie), MAX(d.temps_saisie), COUNT(d.temps_saisie)
+                    FROM {source}
+                    WHERE {filtres}
+                ''', params).fetchone()
+
+                # Médiane : une ou deux valeurs centrales lues par OFFSET
+                valeurs_centrales = [row[0] for row in conn.execute(f'''
+                    SELECT d.temps_saisie
+                    FROM {source}
+                    WHERE {filtres} AND d.temps_saisie IS NOT NULL
+                    ORDER BY d.temps_saisie
+                    LIMIT ? OFFSET ?
+                ''', params + [2 - nb_temps % 2, max((nb_temps - 1) // 2, 0)]).fetchall()]
+                mediane = sum(valeurs_centrales) / len(valeurs_centrales) if valeurs_centrales else 0
+
+                daily_stats = pd.read_sql_query(f'''
+                    SELECT d.jour_traitement as date, COUNT(*) as nombre_saisies, AVG(d.temps_saisie) as temps_moyen
+                    FROM {source}
+                    WHERE {filtres}
+                    GROUP BY d.jour_traitement
+                    ORDER BY date
+                ''', conn, params=params)
+
             # Statistiques descriptives
             st.markdown("### Analyse de la période sélectionnée")
 
@@ -920,32 +3775,25 @@ def tableau_saisies_page():
 
             with col1:
                 st.markdown("**📊 Répartition par fonds:**")
-                fonds_stats = saisies_df['fonds'].value_counts()
-                for fonds, count in fonds_stats.items():
-                    pourcentage = (count / len(saisies_df)) * 100
+                for fonds, count in fonds_stats:
+                    pourcentage = (count / total_saisies) * 100
                     st.write(f"- {fonds}: {count} ({pourcentage:.1f}%)")
 
             with col2:
                 st.markdown("**⏱️ Analyse temporelle:**")
-                st.write(f"- Temps min: {saisies_df['temps_saisie'].min():.0f} min")
-                st.write(f"- Temps max: {saisies_df['temps_saisie'].max():.0f} min")
-                st.write(f"- Médiane: {saisies_df['temps_saisie'].median():.1f} min")
+                st.write(f"- Temps min: {temps_min or 0:.0f} min")
+                st.write(f"- Temps max: {temps_max or 0:.0f} min")
+                st.write(f"- Médiane: {mediane:.1f} min")
 
-                temps_moyen = saisies_df['temps_saisie'].mean()
-                efficacite = "🟢 Très efficace" if temps_moyen <= 8 else "🟡 Efficace" if temps_moyen <= 12 else "🔴 À améliorer"
+                efficacite = "🟢 Très efficace" if (temps_moyen or 0) <= 8 else "🟡 Efficace" if temps_moyen <= 12 else "🔴 À améliorer"
                 st.write(f"- Efficacité: {efficacite}")
 
             # Graphique des saisies par jour
-            if len(saisies_df) > 1:
-                daily_stats = saisies_df.groupby('date_saisie').agg({
-                    'id': 'count',
-                    'temps_saisie': 'mean'
-                }).reset_index()
-                daily_stats.columns = ['date', 'nombre_saisies', 'temps_moyen']
-
-                fig = px.bar(daily_stats, x='date', y='nombre_saisies',
-                             title="Évolution des saisies par jour")
-                st.plotly_chart(fig, use_container_width=True)
+            if total_saisies > 1:
+                with mesure_phase("graphiques"):
+                    fig = px.bar(daily_stats, x='date', y='nombre_saisies',
+                                 title="Évolution des saisies par jour")
+                    st.plotly_chart(fig, use_container_width=True)
 
         # Bouton pour fermer l'analyse
         if st.button("Fermer l'analyse"):
@@ -955,20 +3803,24 @@ def tableau_saisies_page():
     # Affichage du tableau principal
     st.markdown("### 📋 Liste des saisies")
 
-    if not saisies_df.empty:
+    if total_saisies:
         # Configuration de l'affichage
         items_per_page = st.selectbox("Éléments par page", [10, 25, 50, 100], index=1)
 
-        # Pagination
-        total_pages = (len(saisies_df) - 1) // items_per_page + 1
+        # Pagination côté serveur : seules les lignes de la page sont lues
+        total_pages = (total_saisies - 1) // items_per_page + 1
 
         if total_pages > 1:
             page_num = st.selectbox("Page", options=range(1, total_pages + 1))
-            start_idx = (page_num - 1) * items_per_page
-            end_idx = start_idx + items_per_page
-            saisies_page = saisies_df.iloc[start_idx:end_idx]
         else:
-            saisies_page = saisies_df
+            page_num = 1
+
+        curseurs = curseurs_pagination(
+            'curseurs_saisies', (source, filtres, tuple(map(str, params)), tri_filter, items_per_page)
+        )
+        with get_db_connection() as conn:
+            saisies_page = lire_page(conn, colonnes, source, filtres, params, TRIS_SAISIES[tri_filter],
+                                     page_num, items_per_page, curseurs)
 
         # Affichage du tableau avec colonnes configurables
         colonnes_affichage = st.multiselect(
@@ -996,20 +3848,21 @@ def tableau_saisies_page():
             tableau_affichage = saisies_page[colonnes_affichage].rename(columns=colonnes_renommees)
 
             # Affichage avec style
-            st.dataframe(
-                tableau_affichage,
-                use_container_width=True,
-                hide_index=True,
-                column_config={
-                    "Analyse": st.column_config.TextColumn("Analyse", width="large"),
-                    "Temps (min)": st.column_config.NumberColumn("Temps (min)", format="%.0f"),
-                }
-            )
+            with mesure_phase("affichage"):
+                st.dataframe(
+                    tableau_affichage,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        "Analyse": st.column_config.TextColumn("Analyse", width="large"),
+                        "Temps (min)": st.column_config.NumberColumn("Temps (min)", format="%.0f"),
+                    }
+                )
 
             # Informations de pagination
             if total_pages > 1:
                 st.info(
-                    f"Page {page_num} sur {total_pages} - Affichage de {len(saisies_page)} sur {len(saisies_df)} saisies")
+                    f"Page {page_num} sur {total_pages} - Affichage de {len(saisies_page)} sur {total_saisies} saisies")
         else:
             st.warning("Veuillez sélectionner au moins une colonne à afficher")
     else:
@@ -1027,45 +3880,36 @@ def statistiques_page():
     display_header("📈 Statistiques et Analyses",
                    "Centre National des Archives - Reporting et analyses (Administrateur)")
 
-    # Sélecteur de période
-    periode = st.selectbox("Période d'analyse", [
-        "Toutes les données",
-        "7 derniers jours",
-        "30 derniers jours",
-        "Année en cours"
-    ])
+    # Sélecteurs de période et de regroupement des graphiques temporels
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        periode = st.selectbox("Période d'analyse", [
+            "Toutes les données",
+            "7 derniers jours",
+            "30 derniers jours",
+            "Année en cours"
+        ])
+    with col2:
+        regroupement = st.selectbox("Regroupement", ["Automatique", *GRANULARITES],
+                                    help=f"Au plus {GRAPHIQUES_POINTS_MAX} points par graphique : "
+                                         "un regroupement trop fin est élargi automatiquement")
 
-    with get_db_connection() as conn:
-        # Construction du filtre de période
-        date_filter = ""
-        params = []
+    moteur = get_moteur_statistiques()
+    if moteur is not None:
+        st.caption(f"Moteur analytique : DuckDB — copie des agrégats du "
+                   f"{moteur.synchronise_le.strftime('%d/%m/%Y %H:%M:%S') if moteur.synchronise_le else '—'}, "
+                   f"resynchronisée toutes les {DUCKDB_SYNCHRO_SECONDES} s au plus")
 
-        if periode == "7 derniers jours":
-            date_filter = "WHERE d.date_traitement >= date('now', '-7 days')"
-        elif periode == "30 derniers jours":
-            date_filter = "WHERE d.date_traitement >= date('now', '-30 days')"
-        elif periode == "Année en cours":
-            date_filter = "WHERE strftime('%Y', d.date_traitement) = strftime('%Y', 'now')"
+    with get_db_connection() as conn:
+        # Tous les indicateurs de la page sont lus dans un même instantané
+        metriques = calculer_metriques(moteur or conn, periode)
 
         # Statistiques par archiviste
         st.markdown("### 👥 Statistiques par archiviste")
 
-        query_archivistes = f'''
-            SELECT 
-                u.username,
-                COUNT(d.id) as total_dossiers,
-                AVG(d.temps_saisie) as temps_moyen,
-                MIN(d.date_traitement) as premiere_saisie,
-                MAX(d.date_traitement) as derniere_saisie
-            FROM users u
-            LEFT JOIN dossiers d ON u.id = d.archiviste_id
-            {date_filter.replace('WHERE', 'AND' if 'WHERE' not in date_filter else 'WHERE u.role = "archiviste" AND')}
-            WHERE u.role = "archiviste"
-            GROUP BY u.id, u.username
-            ORDER BY total_dossiers DESC
-        '''
-
-        stats_archivistes = pd.read_sql_query(query_archivistes, conn)
+        stats_archivistes = metriques.archivistes[
+            ['username', 'total_dossiers', 'temps_moyen', 'premiere_saisie', 'derniere_saisie']
+        ].copy()
 
         if not stats_archivistes.empty:
             # Formater les données pour l'affichage
@@ -1077,80 +3921,54 @@ def statistiques_page():
             stats_archivistes['derniere_saisie'] = pd.to_datetime(stats_archivistes['derniere_saisie']).dt.strftime(
                 '%d/%m/%Y')
 
-            st.dataframe(stats_archivistes, use_container_width=True)
+            with mesure_phase("affichage"):
+                st.dataframe(stats_archivistes, use_container_width=True)
         else:
             st.info("Aucune donnée disponible pour la période sélectionnée")
 
-        # Graphiques temporels
+        # Graphiques temporels : une barre ou un point par tranche, regroupés en SQL
+        granularite, evolution = evolution_par_tranche(moteur or conn, periode, regroupement)
+        if regroupement not in ("Automatique", granularite):
+            st.caption(f"Regroupement élargi à : {granularite.lower()} "
+                       f"(au plus {GRAPHIQUES_POINTS_MAX} points par graphique)")
+        unite = granularite.lower()
+
         col1, col2 = st.columns(2)
 
         with col1:
             st.markdown("### 📈 Évolution des saisies")
 
-            query_evolution = f'''
-                SELECT 
-                    DATE(date_traitement) as date,
-                    COUNT(*) as count
-                FROM dossiers d
-                {date_filter}
-                GROUP BY DATE(date_traitement)
-                ORDER BY date
-            '''
-
-            evolution = pd.read_sql_query(query_evolution, conn)
-
             if not evolution.empty:
-                fig = px.bar(evolution, x='date', y='count', title="Nombre de dossiers par jour")
-                st.plotly_chart(fig, use_container_width=True)
+                with mesure_phase("graphiques"):
+                    fig = px.bar(evolution, x='date', y='count', title=f"Nombre de dossiers par {unite}")
+                    st.plotly_chart(fig, use_container_width=True)
             else:
                 st.info("Aucune donnée pour la période sélectionnée")
 
         with col2:
             st.markdown("### ⏱️ Temps de saisie moyen")
 
-            query_temps = f'''
-                SELECT 
-                    DATE(date_traitement) as date,
-                    AVG(temps_saisie) as temps_moyen
-                FROM dossiers d
-                {date_filter}
-                GROUP BY DATE(date_traitement)
-                ORDER BY date
-            '''
-
-            temps_saisie = pd.read_sql_query(query_temps, conn)
-
-            if not temps_saisie.empty:
-                fig = px.line(temps_saisie, x='date', y='temps_moyen',
-                              title="Temps moyen de saisie (minutes)", markers=True)
-                st.plotly_chart(fig, use_container_width=True)
+            if not evolution.empty:
+                with mesure_phase("graphiques"):
+                    fig = px.line(evolution, x='date', y='temps_moyen',
+                                  title=f"Temps moyen de saisie par {unite} (minutes)", markers=True)
+                    st.plotly_chart(fig, use_container_width=True)
             else:
                 st.info("Aucune donnée pour la période sélectionnée")
 
         # Répartition par fonds
         st.markdown("### 📁 Répartition par fonds documentaires")
 
-        query_fonds = f'''
-            SELECT 
-                f.nom,
-                COUNT(d.id) as count,
-                AVG(d.temps_saisie) as temps_moyen
-            FROM fonds f
-            LEFT JOIN dossiers d ON f.id = d.fonds_id
-            {date_filter.replace('WHERE', 'AND' if 'WHERE' not in date_filter else 'WHERE')}
-            GROUP BY f.id, f.nom
-            ORDER BY count DESC
-        '''
-
-        fonds_stats = pd.read_sql_query(query_fonds, conn)
+        fonds_stats = metriques.fonds.copy()
 
         if not fonds_stats.empty and fonds_stats['count'].sum() > 0:
             col1, col2 = st.columns(2)
 
             with col1:
-                fig = px.pie(fonds_stats[fonds_stats['count'] > 0], values='count', names='nom',
-                             title="Répartition des dossiers par fonds")
-                st.plotly_chart(fig, use_container_width=True)
+                with mesure_phase("graphiques"):
+                    fig = px.pie(fonds_stats[fonds_stats['count'] > 0], values='count', names='nom',
+                                 title="Répartition des dossiers par fonds")
+                    st.plotly_chart(fig, use_container_width=True)
 
             with col2:
                 fonds_stats['temps_moyen'] = fonds_stats['temps_moyen'].apply(
@@ -1166,35 +3984,31 @@ def statistiques_page():
                     hide_index=True
                 )
 
+        # Mots-clés les plus utilisés sur la période
+        st.markdown("### 🏷️ Top mots-clés")
+
+        top_mots = top_mots_cles(conn, bornes_periode(periode))
+
+        if not top_mots.empty:
+            with mesure_phase("graphiques"):
+                fig = px.bar(top_mots.iloc[::-1], x='nb_dossiers', y='libelle', orientation='h',
+                             title="Mots-clés les plus utilisés", labels={'nb_dossiers': 'Dossiers', 'libelle': ''})
+                fig.update_layout(height=max(300, 25 * len(top_mots)))
+                st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("Aucun mot-clé pour la période sélectionnée")
+
         # Objectifs et projections
         st.markdown("### 🎯 Suivi des objectifs")
 
-        objectif = get_objectif_quotidien()
-        today = datetime.now().date()
-
-        # Dossiers aujourd'hui
-        dossiers_aujourd_hui = pd.read_sql_query(
-            'SELECT COUNT(*) as count FROM dossiers WHERE DATE(date_traitement) = ?',
-            conn, params=[today]
-        ).iloc[0]['count']
-
-        # Moyenne sur les 7 derniers jours
-        moyenne_7j_result = pd.read_sql_query('''
-            SELECT AVG(daily_count) as moyenne FROM (
-                SELECT COUNT(*) as daily_count
-                FROM dossiers
-                WHERE date_traitement >= date('now', '-7 days')
-                GROUP BY DATE(date_traitement)
-            )
-        ''', conn)
-
-        moyenne_7j = moyenne_7j_result.iloc[0]['moyenne'] if not moyenne_7j_result.empty and moyenne_7j_result.iloc[0][
-            'moyenne'] is not None else 0
+        objectif = metriques.objectif
+        dossiers_aujourd_hui = metriques.dossiers_aujourd_hui
+        moyenne_7j = metriques.moyenne_7j
 
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            taux_objectif = (dossiers_aujourd_hui / objectif * 100) if objectif > 0 else 0
+            taux_objectif = metriques.taux_objectif
             color = "🟢" if taux_objectif >= 90 else "🟡" if taux_objectif >= 70 else "🔴"
             st.metric(f"Objectif du jour {color}", f"{dossiers_aujourd_hui}/{objectif}", f"{taux_objectif:.1f}%")
 
@@ -1225,19 +4039,30 @@ def statistiques_page():
                     st.info("Vérifiez qu'il y a des données dans le système ou contactez l'administrateur.")
 
         with col2:
-            # Bouton pour exporter en PDF
+            # Bouton pour exporter en PDF (rendu en arrière-plan, rapports identiques réutilisés)
             if st.button("📥 Exporter PDF", use_container_width=True):
-                try:
-                    with st.spinner("Génération du PDF..."):
-                        pdf_buffer = export_pdf_stats()
-                        st.download_button(
-                            label="Télécharger le rapport PDF",
-                            data=pdf_buffer,
-                            file_name=f"rapport_statistiques_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-                            mime="application/pdf"
-                        )
-                except Exception as e:
-                    st.error(f"Erreur lors de la génération du PDF : {str(e)}")
+                st.session_state.rapport_pdf = (periode, get_generateur_rapports().demander(periode, objectif))
+
+            rapport_pdf = st.session_state.get('rapport_pdf')
+            if rapport_pdf and rapport_pdf[0] == periode:
+                future = rapport_pdf[1]
+                # Court délai de grâce : les rapports déjà en cache sont servis sans clic supplémentaire
+                wait([future], timeout=1)
+
+                if not future.done():
+                    st.info("⏳ Génération du rapport PDF en cours...")
+                    if st.button("🔄 Actualiser", use_container_width=True):
+                        st.rerun()
+                elif future.exception():
+                    st.error(f"Erreur lors de la génération du PDF : {str(future.exception())}")
+                else:
+                    st.download_button(
+                        label="Télécharger le rapport PDF",
+                        data=future.result(),
+                        file_name=f"rapport_statistiques_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
+                        mime="application/pdf",
+                        use_container_width=True
+                    )
 
 
 # Page d'administration
@@ -1248,7 +4073,10 @@ def admin_page():
 
     display_header("⚙️ Administration", "Centre National des Archives - Gestion du système")
 
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(["👥 Utilisateurs", "📁 Fonds", "📄 Objets", "🎯 Objectifs", "🗑️ Gestion"])
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs(
+        ["👥 Utilisateurs", "📁 Fonds", "📄 Objets", "🎯 Objectifs", "🗑️ Gestion", "🐢 Requêtes", "⏱️ Profilage",
+         "📥 Import"]
+    )
 
     # Gestion des utilisateurs
     with tab1:
@@ -1275,6 +4103,7 @@ def admin_page():
                                     (new_username, password_hash, new_role)
                                 )
                                 conn.commit()
+                            invalider_cache_reference("archivistes")
                             st.success(f"Utilisateur {new_username} ajouté avec succès")
                             st.rerun()
                         except sqlite3.IntegrityError:
@@ -1359,6 +4188,7 @@ def admin_page():
                                 cursor = conn.cursor()
                                 cursor.execute('DELETE FROM users WHERE id = ?', (user['id'],))
                                 conn.commit()
+                            invalider_cache_reference("archivistes")
                             st.success(f"Utilisateur {user['username']} supprimé")
                             st.rerun()
                         else:
@@ -1389,6 +4219,7 @@ def admin_page():
                                     (new_fonds_nom, new_fonds_desc)
                                 )
                                 conn.commit()
+                            invalider_cache_reference("fonds")
                             st.success(f"Fonds {new_fonds_nom} ajouté avec succès")
                             st.rerun()
                         except sqlite3.IntegrityError:
@@ -1422,6 +4253,7 @@ def admin_page():
                                     (new_objet_nom, new_objet_desc)
                                 )
                                 conn.commit()
+                            invalider_cache_reference("objets")
                             st.success(f"Objet {new_objet_nom} ajouté avec succès")
                             st.rerun()
                         except sqlite3.IntegrityError:
@@ -1447,6 +4279,7 @@ def admin_page():
                     cursor = conn.cursor()
                     cursor.execute('INSERT INTO objectifs (objectif_quotidien) VALUES (?)', (nouveau_objectif,))
                     conn.commit()
+                invalider_cache_reference("objectif")
                 st.success(f"Objectif mis à jour: {nouveau_objectif} dossiers/jour")
                 st.rerun()
 
@@ -1460,7 +4293,8 @@ def admin_page():
 
         with get_db_connection() as conn:
             # Statistiques générales
-            total_dossiers = pd.read_sql_query('SELECT COUNT(*) as count FROM dossiers', conn).iloc[0]['count']
+            total_dossiers = pd.read_sql_query(f'SELECT COUNT(*) as count FROM {table_dossiers()}',
+                                               conn).iloc[0]['count']
             total_users = pd.read_sql_query('SELECT COUNT(*) as count FROM users', conn).iloc[0]['count']
 
             col1, col2 = st.columns(2)
@@ -1470,28 +4304,299 @@ def admin_page():
                 st.metric("Total utilisateurs", total_users)
 
             # Sauvegarde
+            compresser_export = st.checkbox("Compresser l'export (gzip)", value=False)
+
             if st.button("💾 Exporter toutes les données"):
-                # Export de tous les dossiers
-                all_data = pd.read_sql_query('''
-                    SELECT 
-                        d.*,
-                        f.nom as fonds_nom,
-                        o.nom as objet_nom,
-                        u.username as archiviste_nom
-                    FROM dossiers d
-                    JOIN fonds f ON d.fonds_id = f.id
-                    JOIN objets o ON d.objet_id = o.id
-                    JOIN users u ON d.archiviste_id = u.id
-                    ORDER BY d.date_traitement DESC
-                ''', conn)
-
-                csv = all_data.to_csv(index=False)
-                st.download_button(
-                    label="📥 Télécharger l'export complet",
-                    data=csv,
-                    file_name=f"export_complet_archives_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv"
-                )
+                # Export de tous les dossiers, écrit par lots dans un fichier temporaire
+                with st.spinner("Préparation de l'export..."), \
+                        exporter_csv(conn, requete_export_complet(), compresser=compresser_export) as fichier:
+                    extension = "csv.gz" if compresser_export else "csv"
+                    st.download_button(
+                        label="📥 Télécharger l'export complet",
+                        data=fichier.read(),
+                        file_name=f"export_complet_archives_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+                        mime="application/gzip" if compresser_export else "text/csv"
+                    )
+
+            if st.button("📦 Exporter en Parquet (partitionné par année)"):
+                with st.spinner("Préparation de l'export Parquet..."), exporter_parquet(conn) as fichier:
+                    st.download_button(
+                        label="📥 Télécharger l'export Parquet",
+                        data=fichier.read(),
+                        file_name=f"export_parquet_archives_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                        mime="application/zip"
+                    )
+
+            # Cache des données de référence
+            st.markdown("#### 🧠 Cache des données de référence")
+            stats_cache = get_cache_reference().statistiques()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Hits", stats_cache["hits"])
+            with col2:
+                st.metric("Misses", stats_cache["misses"])
+            with col3:
+                st.metric("Taux de hit", f"{stats_cache['taux']:.1f}%")
+            with col4:
+                st.metric("Invalidations", stats_cache["invalidations"])
+
+            if st.button("♻️ Vider le cache"):
+                invalider_cache_reference()
+                st.success("Cache vidé")
+
+            # Écrivain unique des saisies
+            st.markdown("#### ✍️ Écriture des saisies")
+            stats_ecriture = get_ecrivain_dossiers().statistiques()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Dossiers écrits", stats_ecriture["dossiers"])
+            with col2:
+                st.metric("Transactions", stats_ecriture["transactions"])
+            with col3:
+                st.metric("Dossiers par transaction", f"{stats_ecriture['par_transaction']:.1f}")
+            with col4:
+                st.metric("En attente", stats_ecriture["en_attente"], f"{stats_ecriture['erreurs']} erreur(s)",
+                          delta_color="off")
+            if stats_ecriture["redemarrages"]:
+                st.warning(f"Thread d'écriture relancé {stats_ecriture['redemarrages']} fois depuis le démarrage")
+
+            # Maintenance des agrégats
+            if st.button("🔄 Reconstruire les statistiques journalières"):
+                with st.spinner("Reconstruction des agrégats..."):
+                    conn.execute('BEGIN IMMEDIATE')
+                    try:
+                        reconstruire_stats_journalieres(conn.cursor(), table_dossiers())
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                st.success("Statistiques journalières reconstruites")
+
+            # Partitions annuelles d'archives
+            st.markdown("#### 🗄️ Archivage par année")
+            partitions_df = pd.read_sql_query(
+                'SELECT annee, fichier, nb_dossiers, archive_le FROM partitions_dossiers ORDER BY annee', conn
+            )
+            if not partitions_df.empty:
+                st.dataframe(partitions_df.rename(columns={
+                    'annee': 'Année',
+                    'fichier': 'Fichier',
+                    'nb_dossiers': 'Dossiers',
+                    'archive_le': 'Dernier archivage'
+                }), use_container_width=True, hide_index=True)
+
+            annee_courante = datetime.now().year
+            annee_limite = st.number_input(
+                "Archiver les dossiers traités avant l'année", min_value=1900, max_value=annee_courante,
+                value=annee_courante - ANNEES_CHAUDES + 1,
+                help="Chaque année antérieure est déplacée dans son propre fichier SQLite, attaché à la base : "
+                     "recherche, tableau des saisies et exports continuent de voir tous les dossiers."
+            )
+            if st.button("🗄️ Archiver les années anciennes"):
+                try:
+                    with st.spinner("Archivage en cours (à lancer hors des heures de saisie)..."):
+                        deplaces = archiver_dossiers(get_connection_pool(), annee_limite)
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    if deplaces:
+                        st.success("Dossiers archivés : " + ", ".join(
+                            f"{annee} ({nb})" for annee, nb in sorted(deplaces.items())))
+                    else:
+                        st.info(f"Aucun dossier traité avant {annee_limite} dans la base courante")
+
+            # Détection des quasi-doublons sur toute la base
+            st.markdown("#### 🧬 Quasi-doublons")
+            seuil_doublons = st.slider("Similarité minimale des analyses", 0.5, 1.0, DOUBLONS_SEUIL, 0.05,
+                                       help="Similarité de Jaccard estimée par MinHash, au sein d'un même fonds "
+                                            "et d'un même objet")
+            if st.button("🔍 Rechercher les grappes de quasi-doublons"):
+                debut_analyse = time.monotonic()
+                with st.spinner("Analyse des seaux LSH..."):
+                    grappes_df = grappes_quasi_doublons(conn, seuil_doublons)
+                duree = time.monotonic() - debut_analyse
+                if grappes_df.empty:
+                    st.success(f"Aucun quasi-doublon trouvé ({duree:.1f} s)")
+                else:
+                    st.warning(f"{grappes_df['grappe'].nunique()} grappe(s), {len(grappes_df)} dossier(s) "
+                               f"concerné(s) ({duree:.1f} s)")
+                    st.dataframe(grappes_df.rename(columns={
+                        'grappe': 'Grappe',
+                        'id': 'N°',
+                        'fonds': 'Fonds',
+                        'objet': 'Objet',
+                        'analyse': 'Analyse',
+                        'archiviste': 'Archiviste',
+                        'date_traitement': 'Saisi le'
+                    }), use_container_width=True, hide_index=True)
+
+
+    # Journal des requêtes SQL
+    with tab6:
+        st.markdown("### Journal des requêtes")
+        journal = get_journal_requetes()
+        agregats = journal.agregats()
+        requetes_lentes = journal.requetes_lentes()
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Requêtes exécutées", int(agregats['appels'].sum()))
+        with col2:
+            st.metric("Requêtes lentes conservées", len(requetes_lentes))
+        with col3:
+            st.metric("Seuil de lenteur", f"{journal.seuil_ms:.0f} ms")
+
+        st.markdown("#### ⏱️ Temps cumulé par requête")
+        if not agregats.empty:
+            st.dataframe(
+                agregats.sort_values('total_ms', ascending=False).rename(columns={
+                    'page': 'Page',
+                    'requete': 'Requête',
+                    'appels': 'Appels',
+                    'total_ms': 'Total (ms)',
+                    'max_ms': 'Max (ms)',
+                    'lignes': 'Lignes',
+                    'moyenne_ms': 'Moyenne (ms)'
+                }),
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "Requête": st.column_config.TextColumn("Requête", width="large"),
+                    "Total (ms)": st.column_config.NumberColumn("Total (ms)", format="%.1f"),
+                    "Max (ms)": st.column_config.NumberColumn("Max (ms)", format="%.1f"),
+                    "Moyenne (ms)": st.column_config.NumberColumn("Moyenne (ms)", format="%.2f"),
+                }
+            )
+        else:
+            st.info("Aucune requête enregistrée")
+
+        st.markdown("#### 🐢 Dernières requêtes lentes")
+        if requetes_lentes:
+            with get_db_connection() as conn:
+                for entree in requetes_lentes:
+                    with st.expander(
+                        f"{entree['duree_ms']:.0f} ms — {entree['page']} — "
+                        f"{entree['horodatage'].strftime('%d/%m/%Y %H:%M:%S')} — {entree['lignes']} ligne(s)"
+                    ):
+                        st.code(entree['sql'], language="sql")
+                        if entree['params']:
+                            st.caption(f"Paramètres : {entree['params']}")
+                        st.markdown("**Plan d'exécution (EXPLAIN QUERY PLAN)**")
+                        st.code(plan_requete(conn, entree), language="text")
+        else:
+            st.info(f"Aucune requête n'a dépassé {journal.seuil_ms:.0f} ms")
+
+        if st.button("🧹 Vider le journal des requêtes"):
+            journal.vider()
+            st.rerun()
+
+    # Profilage du rendu des pages
+    with tab7:
+        st.markdown("### Profilage du rendu des pages")
+        profileur = get_profileur_pages()
+
+        if PROFILAGE_ACTIF:
+            st.info("Profilage activé pour toutes les sessions par la variable d'environnement CNA_PROFILAGE")
+        elif profileur.actif:
+            st.success("Profilage actif pour toutes les sessions")
+            if st.button("⏹️ Désactiver le profilage"):
+                profileur.actif = False
+                st.rerun()
+        elif st.button("▶️ Activer le profilage (toutes les sessions)"):
+            profileur.actif = True
+            st.rerun()
+
+        rendus = profileur.rendus()
+        if not rendus.empty:
+            # Synthèse par page : centiles de la durée totale et temps moyen de chaque phase
+            synthese = rendus.groupby('page').agg(
+                rendus=('total_ms', 'size'),
+                p50_ms=('total_ms', 'median'),
+                p95_ms=('total_ms', lambda x: x.quantile(0.95)),
+                **{f"{phase}_ms": (phase, 'mean') for phase in PHASES_RENDU}
+            ).reset_index().sort_values('p95_ms', ascending=False)
+            st.dataframe(synthese.round(1), use_container_width=True, hide_index=True)
+            st.caption("sql : requêtes et lecture des lignes ; graphiques : construction et envoi des figures ; "
+                       "affichage : cartes et tableaux ; calculs : pandas et reste du script")
+
+            page_profilee = st.selectbox("Page", synthese['page'].tolist())
+            rendus_page = rendus[rendus['page'] == page_profilee]
+            col1, col2 = st.columns(2)
+            with col1:
+                fig = px.histogram(rendus_page, x='total_ms', nbins=30, title="Distribution des durées de rendu (ms)")
+                st.plotly_chart(fig, use_container_width=True)
+            with col2:
+                fig = px.bar(rendus_page[list(PHASES_RENDU)].mean().reset_index(name='ms'), x='index', y='ms',
+                             title="Temps moyen par phase (ms)", labels={'index': 'Phase'})
+                st.plotly_chart(fig, use_container_width=True)
+
+            if st.button("🧹 Vider l'historique de profilage"):
+                profileur.vider()
+                st.rerun()
+        elif profileur.actif:
+            st.info("Aucun rendu mesuré pour le moment : naviguez dans l'application puis revenez ici")
+
+        # Capture cProfile d'un rendu unique
+        st.markdown("#### 🔬 Capture cProfile")
+        if st.button("🎯 Profiler le prochain rendu"):
+            st.session_state.capture_cprofile = True
+            st.info("Le prochain affichage de page de cette session sera profilé avec cProfile")
+
+        rapport_cprofile = st.session_state.get('rapport_cprofile')
+        if rapport_cprofile:
+            st.markdown(f"Capture de **{rapport_cprofile['page']}** — "
+                        f"{rapport_cprofile['horodatage'].strftime('%d/%m/%Y %H:%M:%S')}")
+            st.code(rapport_cprofile['texte'], language="text")
+            st.download_button(
+                label="Télécharger le profil (.prof, lisible avec pstats ou snakeviz)",
+                data=rapport_cprofile['stats'],
+                file_name=f"profil_{rapport_cprofile['horodatage'].strftime('%Y%m%d_%H%M%S')}.prof",
+                mime="application/octet-stream"
+            )
+
+    # Import en masse
+    with tab8:
+        st.markdown("### Import en masse de dossiers")
+        st.info(
+            "Colonnes obligatoires : **fonds**, **objet**, **analyse**. "
+            "Colonnes facultatives : mots_cles, date_debut, date_fin, archiviste, date_traitement, temps_saisie. "
+            "Les fonds, objets et archivistes doivent exister ; sans archiviste, les dossiers vous sont attribués. "
+            f"Le fichier CSV doit être encodé en UTF-8. L'import procède par lots de {IMPORT_TAILLE_LOT} lignes : "
+            "si la lecture échoue en cours de fichier, les lots déjà importés sont conservés."
+        )
+
+        fichier_import = st.file_uploader("Fichier à importer", type=["csv", "xlsx"])
+
+        if fichier_import is not None and st.button("📥 Lancer l'import"):
+            debut_import = time.monotonic()
+            try:
+                with st.spinner("Import en cours..."), get_db_connection() as conn:
+                    nb_importes, rejets_df, erreur_import = importer_dossiers(
+                        conn, fichier_import, fichier_import.name, st.session_state.user['id']
+                    )
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                if nb_importes:
+                    invalider_cache_reference("annees")
+                    with get_db_connection() as conn:
+                        get_index_mots_cles().charger(conn)
+                duree = time.monotonic() - debut_import
+                if erreur_import:
+                    st.error(erreur_import)
+                else:
+                    st.success(f"{nb_importes} dossier(s) importé(s) en {duree:.1f} s "
+                               f"({nb_importes / duree if duree > 0 else 0:.0f} lignes/s)")
+
+                if not rejets_df.empty:
+                    st.warning(f"{len(rejets_df)} ligne(s) rejetée(s)")
+                    st.dataframe(rejets_df.head(100), use_container_width=True, hide_index=True)
+                    st.download_button(
+                        label="📄 Télécharger les lignes rejetées",
+                        data=rejets_df.to_csv(index=False),
+                        file_name=f"rejets_import_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                        mime="text/csv"
+                    )
 
 
 # Page principale après connexion
@@ -1563,19 +4668,21 @@ def main_app():
 
         page = st.selectbox("Navigation", pages)
 
-    # Contenu principal selon la page sélectionnée
-    if page == "📊 Tableau de bord":
-        dashboard_page()
-    elif page == "📝 Saisie de dossier":
-        saisie_dossier_page()
-    elif page == "📋 Tableau des saisies":
-        tableau_saisies_page()
-    elif page == "🔍 Recherche":
-        recherche_page()
-    elif page == "📈 Statistiques":
-        statistiques_page()
-    elif page == "⚙️ Administration":
-        admin_page()
+    # Contenu principal selon la page sélectionnée (les requêtes SQL sont attribuées à la page dans le journal)
+    profilage_cprofile = capture_cprofile(page) if st.session_state.pop('capture_cprofile', False) else nullcontext()
+    with get_journal_requetes().page(page), get_profileur_pages().rendu(page), profilage_cprofile:
+        if page == "📊 Tableau de bord":
+            dashboard_page()
+        elif page == "📝 Saisie de dossier":
+            saisie_dossier_page()
+        elif page == "📋 Tableau des saisies":
+            tableau_saisies_page()
+        elif page == "🔍 Recherche":
+            recherche_page()
+        elif page == "📈 Statistiques":
+            statistiques_page()
+        elif page == "⚙️ Administration":
+            admin_page()
 
 
 # Application principale
@@ -0,0 +1,336 @@
+"""Banc d'essai des requêtes de l'application CNA sur une base synthétique reproductible.
+
+Exemple : python benchmark.py --dossiers 100000 --repetitions 20 --sortie resultats.json
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Vocabulaire de génération (analyses et mots-clés réalistes)
+FONDS_SUPPLEMENTAIRES = [
+    "ÉTAT CIVIL", "CADASTRE", "ENSEIGNEMENT", "SANTÉ PUBLIQUE", "TRAVAUX PUBLICS", "AGRICULTURE",
+    "JUSTICE", "FINANCES PUBLIQUES", "AFFAIRES ÉTRANGÈRES", "CULTURE", "DOMAINES", "ÉLECTIONS",
+]
+OBJETS_SUPPLEMENTAIRES = [
+    "Registre", "Arrêté", "Décret", "Rapport", "Plan", "Note de service", "Recensement",
+    "Délibération", "Convention", "Inventaire",
+]
+SUJETS = [
+    "l'acte de naissance", "la construction de l'école primaire", "le recensement de la population",
+    "la gestion du personnel enseignant", "l'attribution des marchés publics", "la délimitation des parcelles",
+    "le budget de fonctionnement", "la réhabilitation du dispensaire", "les élections municipales",
+    "le contentieux foncier", "la nomination des agents", "l'approvisionnement en eau potable",
+    "la campagne de vaccination", "l'entretien des routes", "les pensions de retraite",
+    "la coopération décentralisée", "le recouvrement des impôts", "l'état civil des étrangers",
+]
+LIEUX = [
+    "de la commune de Bouaké", "d'Abidjan", "de Yamoussoukro", "de Korhogo", "de Daloa",
+    "de San-Pédro", "de Man", "de Gagnoa", "d'Odienné", "de Bondoukou", "de la sous-préfecture de Dabou",
+]
+MOTS_CLES = [
+    "naissance", "mariage", "décès", "état civil", "école", "enseignant", "marché public", "contrat",
+    "facture", "budget", "impôt", "foncier", "parcelle", "cadastre", "élection", "personnel",
+    "retraite", "pension", "santé", "vaccination", "route", "eau potable", "coopération", "arrêté",
+    "nomination", "recensement", "archives", "correspondance", "procès-verbal", "réhabilitation",
+]
+
+# Recherches plein texte représentatives des saisies utilisateurs
+RECHERCHES = ["registre", "naiss*", '"état civil"', "contrat AND NOT facture", "ecole OR enseignant"]
+# Filtres par mots-clés exacts (index inversé)
+MOTS_CLES_EXACTS = [("Naissance",), ("école", "enseignant")]
+
+PERIODES_STATISTIQUES = ["Toutes les données", "7 derniers jours", "30 derniers jours", "Année en cours"]
+PERIODES_SAISIES = ["Toutes les données", "Aujourd'hui", "Cette semaine", "Ce mois", "Période personnalisée"]
+# Étendue de la période personnalisée mesurée, terminée aujourd'hui
+PERIODE_PERSONNALISEE_JOURS = 90
+
+
+def charger_application(db_path):
+    """Importe archives_app en pointant sa configuration sur la base du banc d'essai"""
+    os.environ["CNA_DB_PATH"] = db_path
+    # Hors de `streamlit run`, Streamlit signale chaque appel d'interface : ces avertissements sont sans objet ici
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    import archives_app
+    for nom in list(logging.root.manager.loggerDict):
+        if nom.startswith("streamlit"):
+            logging.getLogger(nom).setLevel(logging.ERROR)
+    return archives_app
+
+
+def generer_donnees(conn, nb_dossiers, nb_archivistes, nb_fonds, nb_objets, graine, date_reference, taille_lot,
+                    indexer_mots_cles, indexer_minhash):
+    """Remplit une base vide avec des dossiers synthétiques déterministes pour une graine donnée"""
+    aleatoire = random.Random(graine)
+
+    mot_de_passe = hashlib.sha256("archiviste".encode()).hexdigest()
+    conn.executemany(
+        "INSERT OR IGNORE INTO users (username, password_hash, role) VALUES (?, ?, 'archiviste')",
+        [(f"archiviste{i:03d}", mot_de_passe) for i in range(1, nb_archivistes + 1)]
+    )
+    for table, noms in (("fonds", FONDS_SUPPLEMENTAIRES), ("objets", OBJETS_SUPPLEMENTAIRES)):
+        existants = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        cible = nb_fonds if table == "fonds" else nb_objets
+        for i in range(max(cible - existants, 0)):
+            nom = noms[i] if i < len(noms) else f"{noms[i % len(noms)]} {i // len(noms) + 1}"
+            conn.execute(f"INSERT OR IGNORE INTO {table} (nom) VALUES (?)", (nom,))
+    conn.commit()
+
+    archivistes = [r[0] for r in conn.execute("SELECT id FROM users WHERE role = 'archiviste' ORDER BY id")]
+    fonds = [r[0] for r in conn.execute("SELECT id FROM fonds ORDER BY id")]
+    objets = [(r[0], r[1]) for r in conn.execute("SELECT id, nom FROM objets ORDER BY id")]
+
+    def dossier():
+        objet_id, objet = aleatoire.choice(objets)
+        annee_debut = aleatoire.randint(1900, 2020)
+        annee_fin = annee_debut + aleatoire.randint(0, 10)
+        analyse = f"{objet} relatif à {aleatoire.choice(SUJETS)} {aleatoire.choice(LIEUX)} ({annee_debut}-{annee_fin})"
+        mots_cles = ", ".join(aleatoire.sample(MOTS_CLES, aleatoire.randint(2, 5)))
+        # Saisies réparties sur trois ans, plus denses sur la période récente
+        anciennete = int(aleatoire.triangular(0, 3 * 365, 0))
+        traitement = date_reference - timedelta(days=anciennete, seconds=aleatoire.randint(0, 10 * 3600))
+        temps = aleatoire.randint(2, 30) if aleatoire.random() > 0.05 else None
+        # Quelques saisies anciennes sans objet (colonne facultative du schéma initial)
+        if aleatoire.random() < 0.01:
+            objet_id = None
+        return (aleatoire.choice(fonds), objet_id, analyse, mots_cles, f"{annee_debut}-01-01", f"{annee_fin}-12-31",
+                aleatoire.choice(archivistes), traitement.strftime('%Y-%m-%d %H:%M:%S'), temps)
+
+    inseres = 0
+    while inseres < nb_dossiers:
+        lot = [dossier() for _ in range(min(taille_lot, nb_dossiers - inseres))]
+        conn.execute("BEGIN IMMEDIATE")
+        dernier_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM dossiers").fetchone()[0]
+        conn.executemany('''
+            INSERT INTO dossiers (fonds_id, objet_id, analyse, mots_cles, date_debut, date_fin,
+                                  archiviste_id, date_traitement, temps_saisie)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', lot)
+        indexer_mots_cles(conn, conn.execute("SELECT id, mots_cles FROM dossiers WHERE id > ?",
+                                             (dernier_id,)).fetchall())
+        indexer_minhash(conn, conn.execute("SELECT id, fonds_id, objet_id, analyse FROM dossiers WHERE id > ?",
+                                           (dernier_id,)).fetchall())
+        conn.commit()
+        inseres += len(lot)
+        print(f"  {inseres}/{nb_dossiers} dossiers générés", file=sys.stderr)
+
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+def scenarios(app, objectif, moteur=None):
+    """Chemins de requêtes de chaque page, sous forme de (nom, fonction(conn))"""
+
+    def page_recherche(requete_fts, mots_cles=()):
+        def executer(conn):
+            mots_cles_ids = [ligne[0] for ligne in conn.execute(
+                f"SELECT id FROM mots_cles WHERE terme IN ({','.join('?' * len(mots_cles))})",
+                [app.normaliser_mot_cle(mot) for mot in mots_cles]
+            )] if mots_cles else ()
+            source, filtres, params, tri = app.requete_recherche(requete_fts, mots_cles_ids=mots_cles_ids)
+            colonnes = app.COLONNES_RECHERCHE + (app.COLONNES_EXTRAITS_FTS if requete_fts else "")
+            # Comptes des facettes et total des résultats comme la page, sans réutiliser de cache
+            app.compter_facettes_recherche(conn, requete_fts, mots_cles_ids=mots_cles_ids, cache=app.CacheFacettes())
+            return app.lire_page(conn, colonnes, source, filtres, params, tri, 1, 10, None if requete_fts else {})
+        return executer
+
+    def page_saisies(periode, tri):
+        aujourd_hui = datetime.now().date()
+        bornes = app.bornes_periode(periode, aujourd_hui - timedelta(days=PERIODE_PERSONNALISEE_JOURS), aujourd_hui)
+
+        def executer(conn):
+            source, filtres, params = app.requete_saisies(bornes)
+            app.resume_saisies(conn, source, filtres, params)
+            return app.lire_page(conn, app.COLONNES_SAISIES, source, filtres, params,
+                                 app.TRIS_SAISIES[tri], 1, 25, {})
+        return executer
+
+    def saisie_quasi_doublons(conn):
+        # Vérification faite avant l'enregistrement d'une saisie reprenant l'analyse d'un dossier existant
+        fonds_id, objet_id, analyse = conn.execute(
+            "SELECT fonds_id, objet_id, analyse FROM dossiers WHERE objet_id IS NOT NULL ORDER BY id LIMIT 1"
+        ).fetchone()
+        return app.quasi_doublons(conn, fonds_id, objet_id, analyse + " (copie)")
+
+    def synchronisation_apres_saisie(conn):
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute('''
+            INSERT INTO dossiers (fonds_id, objet_id, analyse, archiviste_id, temps_saisie)
+            SELECT fonds_id, objet_id, analyse, archiviste_id, temps_saisie FROM dossiers ORDER BY id DESC LIMIT 1
+        ''')
+        conn.commit()
+        moteur.synchroniser()
+
+    def tableau_de_bord_rafraichissement():
+        etat = {}
+
+        def executer(conn):
+            # Compteurs calculés à l'ouverture, puis complétés à chaque rafraîchissement du fragment
+            if not etat:
+                etat.update(app._etat_tableau_de_bord(conn))
+            return app._etat_tableau_de_bord(conn, etat)
+        return executer
+
+    def export_csv(conn):
+        with app.exporter_csv(conn, app.requete_export_complet()) as fichier:
+            return fichier.seek(0, os.SEEK_END)
+
+    def export_parquet(conn):
+        with app.exporter_parquet(conn) as fichier:
+            return fichier.seek(0, os.SEEK_END)
+
+    liste = [("tableau_de_bord/ouverture", lambda conn: app._etat_tableau_de_bord(conn)),
+             ("tableau_de_bord/rafraichissement", tableau_de_bord_rafraichissement())]
+    liste.append(("recherche/sans_mot_cle", page_recherche("")))
+    for texte in RECHERCHES:
+        liste.append((f"recherche/{texte}", page_recherche(app.construire_requete_fts(texte))))
+    for mots_cles in MOTS_CLES_EXACTS:
+        liste.append((f"recherche/mots_cles={'+'.join(mots_cles)}", page_recherche("", mots_cles)))
+    for periode in PERIODES_SAISIES:
+        for tri in app.TRIS_SAISIES:
+            liste.append((f"saisies/{periode}/{tri}", page_saisies(periode, tri)))
+    for periode in PERIODES_STATISTIQUES:
+        liste.append((f"statistiques/{periode}", lambda conn, p=periode: app.calculer_metriques(conn, p, objectif)))
+        liste.append((f"statistiques/evolution/{periode}",
+                      lambda conn, p=periode: app.evolution_par_tranche(conn, p)))
+        liste.append((f"statistiques/top_mots_cles/{periode}",
+                      lambda conn, p=periode: app.top_mots_cles(conn, app.bornes_periode(p))))
+    if moteur is not None:
+        # Mêmes indicateurs lus dans la copie DuckDB des agrégats (synchronisée avant la mesure)
+        for periode in PERIODES_STATISTIQUES:
+            liste.append((f"statistiques_duckdb/{periode}",
+                          lambda conn, p=periode: app.calculer_metriques(moteur, p, objectif)))
+    liste.append(("saisie/quasi_doublons", saisie_quasi_doublons))
+    liste.append(("administration/quasi_doublons", app.grappes_quasi_doublons))
+    liste.append(("administration/export_csv", export_csv))
+    liste.append(("administration/export_parquet", export_parquet))
+    if moteur is not None:
+        # Coût de la synchronisation DuckDB : copie complète, puis mise à jour incrémentale après une saisie
+        # (mesurée en dernier : chaque exécution ajoute un dossier)
+        liste.append(("statistiques_duckdb/synchronisation_complete", lambda conn: moteur.synchroniser(forcer=True)))
+        liste.append(("statistiques_duckdb/synchronisation_apres_saisie", synchronisation_apres_saisie))
+    return liste
+
+
+def centile(valeurs, rang):
+    """Centile par rang le plus proche sur une liste triée"""
+    index = max(0, min(len(valeurs) - 1, int(round(rang / 100 * len(valeurs) + 0.5)) - 1))
+    return valeurs[index]
+
+
+def mesurer(conn, fonction, repetitions):
+    """Durées (ms) après une exécution de chauffe, puis pic mémoire Python (Kio) sur une exécution dédiée"""
+    fonction(conn)
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction(conn)
+        durees.append((time.perf_counter() - debut) * 1000)
+    durees.sort()
+
+    # tracemalloc ralentit l'exécution : la mémoire est mesurée à part
+    tracemalloc.start()
+    fonction(conn)
+    pic = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "repetitions": repetitions,
+        "p50_ms": round(centile(durees, 50), 3),
+        "p95_ms": round(centile(durees, 95), 3),
+        "min_ms": round(durees[0], 3),
+        "max_ms": round(durees[-1], 3),
+        "pic_memoire_kio": round(pic / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai des requêtes de l'application CNA")
+    parser.add_argument("--dossiers", type=int, default=10000, help="nombre de dossiers générés (défaut : 10000)")
+    parser.add_argument("--archivistes", type=int, default=20)
+    parser.add_argument("--fonds", type=int, default=12)
+    parser.add_argument("--objets", type=int, default=15)
+    parser.add_argument("--graine", type=int, default=42, help="graine du générateur (données reproductibles)")
+    parser.add_argument("--date-reference", default=None,
+                        help="date de la saisie la plus récente, AAAA-MM-JJ (défaut : aujourd'hui)")
+    parser.add_argument("--repetitions", type=int, default=20, help="mesures par scénario (défaut : 20)")
+    parser.add_argument("--repetitions-export", type=int, default=3, help="mesures par export complet (défaut : 3)")
+    parser.add_argument("--base", default=None,
+                        help="fichier SQLite à utiliser ; réutilisé tel quel s'il existe (défaut : fichier temporaire)")
+    parser.add_argument("--filtre", default="", help="ne mesure que les scénarios dont le nom contient ce texte")
+    parser.add_argument("--sortie", default=None, help="fichier JSON de résultats (défaut : sortie standard)")
+    args = parser.parse_args()
+
+    db_path = args.base or os.path.join(tempfile.mkdtemp(prefix="cna_benchmark_"), "archives.db")
+    base_existante = os.path.exists(db_path)
+    app = charger_application(db_path)
+
+    pool = app.ConnectionPool(db_path)
+    with pool.connection() as conn:
+        app.apply_migrations(conn)
+
+        if base_existante:
+            print(f"Réutilisation de la base {db_path}", file=sys.stderr)
+        else:
+            date_reference = (datetime.strptime(args.date_reference, "%Y-%m-%d") if args.date_reference
+                              else datetime.now().replace(microsecond=0))
+            print(f"Génération de la base {db_path}", file=sys.stderr)
+            debut = time.perf_counter()
+            generer_donnees(conn, args.dossiers, args.archivistes, args.fonds, args.objets, args.graine,
+                            date_reference, app.IMPORT_TAILLE_LOT, app.indexer_mots_cles, app.indexer_minhash)
+            print(f"  générée en {time.perf_counter() - debut:.1f} s", file=sys.stderr)
+
+        ligne = conn.execute('SELECT objectif_quotidien FROM objectifs ORDER BY updated_at DESC LIMIT 1').fetchone()
+        objectif = ligne[0] if ligne else 10
+
+        # Sans intervalle minimal : chaque lecture DuckDB mesurée inclut la vérification de version
+        moteur = app.MoteurDuckDB(pool, intervalle=0) if app.duckdb is not None else None
+
+        resultats = {}
+        for nom, fonction in scenarios(app, objectif, moteur):
+            if args.filtre not in nom:
+                continue
+            repetitions = args.repetitions_export if nom.startswith("administration/") else args.repetitions
+            print(f"Mesure : {nom}", file=sys.stderr)
+            resultats[nom] = mesurer(conn, fonction, repetitions)
+
+        volumetrie = {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("dossiers", "users", "fonds", "objets", "stats_journalieres")
+        }
+
+    rapport = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "base": db_path,
+        "parametres": {k: v for k, v in vars(args).items() if k not in ("sortie", "base")},
+        "volumetrie": volumetrie,
+        "environnement": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plateforme": platform.platform(),
+        },
+        # ru_maxrss est en Kio sous Linux (octets sous macOS)
+        "pic_rss_processus_kio": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "scenarios": resultats,
+    }
+
+    texte = json.dumps(rapport, ensure_ascii=False, indent=2)
+    if args.sortie:
+        with open(args.sortie, "w", encoding="utf-8") as f:
+            f.write(texte + "\n")
+    else:
+        print(texte)
+
+
+if __name__ == "__main__":
+    main()